@@ -0,0 +1,278 @@
+"""Admission control: adaptive per-route concurrency limits and deadlines.
+
+Each route (method + path template) has a concurrency limit that adapts to
+the latency it observes, AIMD style: every fast response while the route is
+busy raises the limit by one, every slow or timed-out response cuts it by
+`BACKOFF`. "Slow" is relative to the route's own baseline, the lowest
+latency seen recently. Requests over the limit are rejected at once with
+503 and `Retry-After` instead of queueing behind the connection pool or the
+bcrypt threads.
+
+Every admitted request also gets a deadline. When it passes, or the client
+disconnects before the response is complete, the request is cancelled; on
+PostgreSQL each transaction it opens carries a `statement_timeout` for the
+time left, so a query still running in the threadpool is stopped by the
+database as well. Work that cannot be interrupted keeps its slot until it
+finishes.
+"""
+import asyncio
+import os
+import time
+from contextvars import ContextVar
+
+import anyio
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.routing import compile_path
+
+ADMISSION_ENABLED = os.environ.get("TODOAPP_ADMISSION", "on") != "off"
+INITIAL_LIMIT = 20
+MIN_LIMIT = 1
+MAX_LIMIT = int(os.environ.get("TODOAPP_ADMISSION_MAX_LIMIT", "200"))
+BACKOFF = 0.9
+# A response is slow if it took this many times the route's baseline ...
+LATENCY_TOLERANCE = 2.0
+# ... and longer than this; sub-millisecond baselines would make any jitter look slow.
+MIN_SLOW_LATENCY_SECONDS = 0.05
+# How quickly the baseline follows latencies above it, so it can recover from a lucky minimum.
+BASELINE_DRIFT = 0.01
+RETRY_AFTER_SECONDS = 1
+
+DEFAULT_DEADLINE_SECONDS = float(os.environ.get("TODOAPP_REQUEST_DEADLINE_SECONDS", "10"))
+# Path templates with their own deadline; None disables deadline and limit.
+ROUTE_DEADLINES = {
+    "/todos/stream": None,
+    "/admin/import/users": 300.0,
+    "/admin/import/todos": 300.0,
+}
+
+_deadline = ContextVar("request_deadline", default=None)
+
+
+class AdaptiveLimit:
+    def __init__(self, initial: int = INITIAL_LIMIT, min_limit: int = MIN_LIMIT, max_limit: int = MAX_LIMIT):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.inflight = 0
+        self.baseline = None
+        self.accepted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def try_acquire(self):
+        if self.inflight >= max(self.min_limit, int(self.limit)):
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        self.accepted += 1
+        return True
+
+    def release(self, latency: float, dropped: bool = False):
+        """Record a finished request; `dropped` marks a timeout."""
+        busy = self.inflight * 2 >= self.limit
+        self.inflight -= 1
+        if dropped:
+            self.timeouts += 1
+        elif self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * BASELINE_DRIFT
+        if dropped or latency > max(MIN_SLOW_LATENCY_SECONDS, LATENCY_TOLERANCE * self.baseline):
+            self.limit = max(self.min_limit, self.limit * BACKOFF)
+        elif busy:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def to_dict(self):
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "baseline_ms": round(self.baseline * 1000, 3) if self.baseline is not None else None,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+
+def route_table(app):
+    """`(regex, path template, methods)` of every route in the OpenAPI schema."""
+    table = [
+        (compile_path(template)[0], template, {method.upper() for method in operations})
+        for template, operations in app.openapi()["paths"].items()
+    ]
+    # Literal segments win, e.g. /todos/stream over /todos/{todo_id}.
+    table.sort(key=lambda entry: entry[1].count("{"))
+    return table
+
+
+def remaining_seconds():
+    """Time left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session, transaction, connection):
+    remaining = remaining_seconds()
+    if remaining is not None and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(remaining * 1000))}")
+
+
+class _DisconnectWatcher:
+    """Relay `receive` to the app while noticing a client disconnect.
+
+    The queue holds one message, so the request body is still read at the
+    app's pace; once the body is done the watcher waits for the disconnect.
+    Servers report `http.disconnect` once the response has been sent too, so
+    after `response_complete` it is passed on without counting as one.
+    """
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._messages = asyncio.Queue(maxsize=1)
+        self.disconnected = asyncio.Event()
+        self.response_complete = False
+
+    async def run(self):
+        while True:
+            message = await self._receive()
+            if message["type"] == "http.disconnect" and not self.response_complete:
+                self.disconnected.set()
+            await self._messages.put(message)
+            if message["type"] == "http.disconnect":
+                return
+
+    async def __call__(self):
+        return await self._messages.get()
+
+
+class AdmissionController:
+    """Per-route limits and deadlines shared by the middleware and the metrics endpoint."""
+
+    def __init__(self, enabled: bool = ADMISSION_ENABLED, default_deadline: float = DEFAULT_DEADLINE_SECONDS,
+                 route_deadlines: dict | None = None, initial_limit: int = INITIAL_LIMIT):
+        self.enabled = enabled
+        self.default_deadline = default_deadline
+        self.route_deadlines = dict(ROUTE_DEADLINES if route_deadlines is None else route_deadlines)
+        self.initial_limit = initial_limit
+        self.limits = {}
+        # Requests given up on whose work is still running; their slots stay taken until it ends.
+        self.abandoned = set()
+        self._routes = None
+
+    def route_key(self, scope):
+        """`(method, path template)` of the route `scope` is for, or None."""
+        if self._routes is None:
+            self._routes = route_table(scope["app"])
+        for regex, template, methods in self._routes:
+            if scope["method"] in methods and regex.match(scope["path"]):
+                return scope["method"], template
+        return None
+
+    def deadline(self, path_format: str):
+        return self.route_deadlines.get(path_format, self.default_deadline)
+
+    def limit(self, key):
+        limit = self.limits.get(key)
+        if limit is None:
+            limit = self.limits[key] = AdaptiveLimit(self.initial_limit)
+        return limit
+
+    def stats(self):
+        return {f"{method} {path}": limit.to_dict() for (method, path), limit in sorted(self.limits.items())}
+
+
+class AdmissionMiddleware:
+    """Reject requests over their route's limit and cancel those past their deadline."""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+        key = self.controller.route_key(scope)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        deadline = self.controller.deadline(key[1])
+        if deadline is None:
+            await self.app(scope, receive, send)
+            return
+        limit = self.controller.limit(key)
+        if not limit.try_acquire():
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        response_started = False
+        finished_at = None
+        abandoned = False
+        timed_out = False
+        watcher = _DisconnectWatcher(receive)
+        response_done = asyncio.Event()
+
+        async def send_wrapper(message):
+            nonlocal response_started, finished_at
+            if abandoned:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished_at = time.monotonic()
+                watcher.response_complete = True
+                response_done.set()
+            await send(message)
+
+        # An anyio cancel scope rather than Task.cancel(): threadpool calls are
+        # shielded from it, so the task (and the slot) lasts as long as a sync
+        # handler or bcrypt call is still running, holding a pooled connection.
+        cancel_scope = anyio.CancelScope()
+
+        async def run_app():
+            with cancel_scope:
+                await self.app(scope, watcher, send_wrapper)
+
+        def on_done(task):
+            self.controller.abandoned.discard(task)
+            if not task.cancelled():
+                task.exception()  # Raised to the server unless abandoned.
+            limit.release((finished_at or time.monotonic()) - started, dropped=timed_out)
+
+        token = _deadline.set(started + deadline)
+        app_task = asyncio.ensure_future(run_app())
+        _deadline.reset(token)
+        app_task.add_done_callback(on_done)
+        watcher_task = asyncio.ensure_future(watcher.run())
+        disconnected = asyncio.ensure_future(watcher.disconnected.wait())
+        responded = asyncio.ensure_future(response_done.wait())
+        try:
+            done, _ = await asyncio.wait({app_task, disconnected, responded}, timeout=deadline,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if app_task in done or responded in done:
+                # Background tasks and dependency teardown run after the
+                # response; they are not subject to the deadline.
+                await app_task
+            else:
+                timed_out = not disconnected.done()
+                abandoned = True
+                cancel_scope.cancel()
+                self.controller.abandoned.add(app_task)
+                if timed_out and not response_started:
+                    response = JSONResponse({"detail": "Request deadline exceeded"}, status_code=504)
+                    await response(scope, receive, send)
+        finally:
+            watcher_task.cancel()
+            disconnected.cancel()
+            responded.cancel()
+
+
+controller = AdmissionController()
@@ -0,0 +1,166 @@
+"""Hash-partition todos by owner_id (PostgreSQL only)
+
+The table is converted online: a partitioned copy is created, a trigger keeps
+it in sync with writes to the live table while existing rows are copied over
+in batches, and the two are swapped under a short exclusive lock.
+
+The partition count defaults to 16 and can be set with
+    alembic -x todo_partitions=32 upgrade head
+
+owner_id, part of the partition key and of the primary key, becomes NOT NULL
+on every database; the upgrade stops if any todo has no owner. Other than
+that, this is a no-op on other databases (SQLite in development and tests).
+
+Revision ID: 0ffbeaff8193
+Revises: 39aeea6e270f
+Create Date: 2026-10-19 12:05:48.302716
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0ffbeaff8193'
+down_revision: Union[str, None] = '39aeea6e270f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEFAULT_PARTITIONS = 16
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def _is_postgresql() -> bool:
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def _partitions() -> int:
+    partitions = int(context.get_x_argument(as_dictionary=True).get('todo_partitions', DEFAULT_PARTITIONS))
+    if partitions < 1:
+        raise ValueError('todo_partitions must be at least 1')
+    return partitions
+
+
+def _require_owners() -> None:
+    orphans = op.get_bind().execute(sa.text('SELECT count(*) FROM todos WHERE owner_id IS NULL')).scalar()
+    if orphans:
+        raise RuntimeError(f'{orphans} todos have no owner_id; assign or delete them before upgrading')
+
+
+def upgrade() -> None:
+    _require_owners()
+    if not _is_postgresql():
+        with op.batch_alter_table('todos') as batch_op:
+            batch_op.alter_column('owner_id', existing_type=sa.Integer(), nullable=False)
+        return
+    partitions = _partitions()
+
+    with op.get_context().autocommit_block():
+        # Validated without blocking writes, and keeps new ownerless rows out
+        # of the live table while it is copied.
+        op.execute('ALTER TABLE todos ADD CONSTRAINT todos_owner_id_not_null CHECK (owner_id IS NOT NULL) NOT VALID')
+        op.execute('ALTER TABLE todos VALIDATE CONSTRAINT todos_owner_id_not_null')
+        op.execute(
+            'CREATE TABLE todos_partitioned (LIKE todos INCLUDING DEFAULTS) '
+            'PARTITION BY HASH (owner_id)'
+        )
+        for remainder in range(partitions):
+            op.execute(
+                f'CREATE TABLE todos_p{remainder} PARTITION OF todos_partitioned '
+                f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+            )
+        # The partition key has to be part of the primary key.
+        op.execute('ALTER TABLE todos_partitioned ALTER COLUMN owner_id SET NOT NULL')
+        op.execute('ALTER TABLE todos_partitioned ADD CONSTRAINT todos_partitioned_pkey PRIMARY KEY (id, owner_id)')
+        op.execute(
+            'ALTER TABLE todos_partitioned ADD CONSTRAINT todos_partitioned_owner_id_fkey '
+            'FOREIGN KEY (owner_id) REFERENCES users (id)'
+        )
+        op.execute('CREATE INDEX ix_todos_partitioned_id ON todos_partitioned (id)')
+        op.execute(
+            'CREATE INDEX ix_todos_partitioned_owner_id_live ON todos_partitioned (owner_id) '
+            'WHERE deleted_at IS NULL'
+        )
+        op.execute(
+            'CREATE INDEX ix_todos_partitioned_deleted_at ON todos_partitioned (deleted_at) '
+            'WHERE deleted_at IS NOT NULL'
+        )
+
+        # Mirror every write to the live table while the backfill runs.
+        op.execute('''
+            CREATE FUNCTION todos_mirror_to_partitioned() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    DELETE FROM todos_partitioned WHERE id = OLD.id AND owner_id = OLD.owner_id;
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    INSERT INTO todos_partitioned SELECT (NEW).* ON CONFLICT DO NOTHING;
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        ''')
+        op.execute(
+            'CREATE TRIGGER todos_mirror AFTER INSERT OR UPDATE OR DELETE ON todos '
+            'FOR EACH ROW EXECUTE FUNCTION todos_mirror_to_partitioned()'
+        )
+
+        # Copy existing rows in id ranges, one short transaction per batch.
+        # FOR SHARE makes concurrent updates/deletes of a batch wait for it,
+        # so the trigger then sees (and fixes up) the copied row.
+        bounds = op.get_bind().execute(sa.text('SELECT min(id), max(id) FROM todos')).one()
+        if bounds[0] is not None:
+            for low in range(bounds[0] - 1, bounds[1], BACKFILL_BATCH_SIZE):
+                op.execute(sa.text(
+                    'INSERT INTO todos_partitioned '
+                    'SELECT * FROM todos WHERE id > :low AND id <= :high '
+                    'FOR SHARE '
+                    'ON CONFLICT DO NOTHING'
+                ).bindparams(low=low, high=low + BACKFILL_BATCH_SIZE))
+
+        op.execute('BEGIN')
+        op.execute('LOCK TABLE todos IN ACCESS EXCLUSIVE MODE')
+        op.execute('DROP TRIGGER todos_mirror ON todos')
+        op.execute('ALTER SEQUENCE todos_id_seq OWNED BY todos_partitioned.id')
+        op.execute('DROP TABLE todos')
+        op.execute('ALTER TABLE todos_partitioned RENAME TO todos')
+        op.execute('ALTER TABLE todos RENAME CONSTRAINT todos_partitioned_pkey TO todos_pkey')
+        op.execute('ALTER TABLE todos RENAME CONSTRAINT todos_partitioned_owner_id_fkey TO todos_owner_id_fkey')
+        op.execute('ALTER INDEX ix_todos_partitioned_id RENAME TO ix_todos_id')
+        op.execute('ALTER INDEX ix_todos_partitioned_owner_id_live RENAME TO ix_todos_owner_id_live')
+        op.execute('ALTER INDEX ix_todos_partitioned_deleted_at RENAME TO ix_todos_deleted_at')
+        op.execute('COMMIT')
+        op.execute('DROP FUNCTION todos_mirror_to_partitioned()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _is_postgresql():
+        with op.batch_alter_table('todos') as batch_op:
+            batch_op.alter_column('owner_id', existing_type=sa.Integer(), nullable=True)
+        return
+    # Offline: the copy back runs inside the migration transaction.
+    op.execute('CREATE TABLE todos_unpartitioned (LIKE todos INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO todos_unpartitioned SELECT * FROM todos')
+    op.execute('ALTER TABLE todos_unpartitioned ALTER COLUMN owner_id DROP NOT NULL')
+    op.execute('ALTER TABLE todos_unpartitioned ADD CONSTRAINT todos_unpartitioned_pkey PRIMARY KEY (id)')
+    op.execute('ALTER SEQUENCE todos_id_seq OWNED BY todos_unpartitioned.id')
+    op.execute('DROP TABLE todos')
+    op.execute('ALTER TABLE todos_unpartitioned RENAME TO todos')
+    op.execute('ALTER TABLE todos RENAME CONSTRAINT todos_unpartitioned_pkey TO todos_pkey')
+    op.create_foreign_key('todos_owner_id_fkey', 'todos', 'users', ['owner_id'], ['id'])
+    op.create_index('ix_todos_id', 'todos', ['id'])
+    op.create_index(
+        'ix_todos_owner_id_live',
+        'todos',
+        ['owner_id'],
+        postgresql_where=sa.text('deleted_at IS NULL'),
+    )
+    op.create_index(
+        'ix_todos_deleted_at',
+        'todos',
+        ['deleted_at'],
+        postgresql_where=sa.text('deleted_at IS NOT NULL'),
+    )
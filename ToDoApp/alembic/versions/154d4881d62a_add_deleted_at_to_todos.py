@@ -0,0 +1,57 @@
+"""Add deleted_at to todos for soft deletes
+
+Revision ID: 154d4881d62a
+Revises: 3cd73b5846d8
+Create Date: 2026-10-19 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '154d4881d62a'
+down_revision: Union[str, None] = '3cd73b5846d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'todos',
+        sa.Column(
+            'deleted_at',
+            sa.DateTime(timezone=True),
+            nullable=True,
+            comment='Set when the todo is soft-deleted; purged in the background'
+        )
+    )
+    # Build the partial index without blocking writes on large tables.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_todos_owner_id_live',
+            'todos',
+            ['owner_id'],
+            postgresql_where=sa.text('deleted_at IS NULL'),
+            sqlite_where=sa.text('deleted_at IS NULL'),
+            postgresql_concurrently=True,
+        )
+        # Tombstones only, for the purge job and its backlog count.
+        op.create_index(
+            'ix_todos_deleted_at',
+            'todos',
+            ['deleted_at'],
+            postgresql_where=sa.text('deleted_at IS NOT NULL'),
+            sqlite_where=sa.text('deleted_at IS NOT NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_todos_deleted_at', table_name='todos', postgresql_concurrently=True)
+        op.drop_index('ix_todos_owner_id_live', table_name='todos', postgresql_concurrently=True)
+    op.drop_column('todos', 'deleted_at')
@@ -0,0 +1,67 @@
+"""Index live todos by owner, completion and priority
+
+Replaces ix_todos_owner_id_live, which is a prefix of the new index, so the
+per-user aggregates of GET /admin/users can be answered from the index.
+
+Revision ID: 16cb095c0159
+Revises: f14e66ad212a
+Create Date: 2026-10-19 15:10:06.274183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '16cb095c0159'
+down_revision: Union[str, None] = 'f14e66ad212a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_todos_index_online(name: str, columns: list, postgresql_where: str, sqlite_where: str) -> None:
+    """Create a partial index on todos without blocking writes (as in 175ccb37ae84)."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index(name, 'todos', columns, sqlite_where=sa.text(sqlite_where))
+        return
+    column_list = ', '.join(columns)
+    with op.get_context().autocommit_block():
+        partitions = bind.execute(sa.text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'todos'::regclass ORDER BY 1"
+        )).scalars().all()
+        if not partitions:
+            op.execute(f'CREATE INDEX CONCURRENTLY {name} ON todos ({column_list}) WHERE {postgresql_where}')
+            return
+        op.execute(f'CREATE INDEX {name} ON ONLY todos ({column_list}) WHERE {postgresql_where}')
+        for partition in partitions:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY {name}_{partition} ON {partition} ({column_list}) '
+                f'WHERE {postgresql_where}'
+            )
+            op.execute(f'ALTER INDEX {name} ATTACH PARTITION {name}_{partition}')
+
+
+def upgrade() -> None:
+    # Create before dropping so list reads are never without an index.
+    _create_todos_index_online(
+        'ix_todos_owner_status_live',
+        ['owner_id', 'complete', 'priority'],
+        postgresql_where='deleted_at IS NULL',
+        sqlite_where='deleted_at IS NULL',
+    )
+    op.drop_index('ix_todos_owner_id_live', table_name='todos')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_todos_owner_id_live',
+        'todos',
+        ['owner_id'],
+        postgresql_where=sa.text('deleted_at IS NULL'),
+        sqlite_where=sa.text('deleted_at IS NULL'),
+    )
+    op.drop_index('ix_todos_owner_status_live', table_name='todos')
@@ -0,0 +1,117 @@
+"""Add updated_at to todos and the todos_archive table
+
+Revision ID: 175ccb37ae84
+Revises: 0ffbeaff8193
+Create Date: 2026-10-19 13:21:40.118305
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '175ccb37ae84'
+down_revision: Union[str, None] = '0ffbeaff8193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL_BATCH_SIZE = 10_000
+
+
+def _create_todos_index_online(name: str, columns: list, postgresql_where: str, sqlite_where: str) -> None:
+    """Create a partial index on todos without blocking writes on PostgreSQL.
+
+    A plain CREATE INDEX on the partitioned table holds a SHARE lock on every
+    partition for the whole build. Instead the parent index is created ON
+    ONLY todos (empty and invalid), each partition is indexed CONCURRENTLY
+    and attached; the parent becomes valid once every partition is attached.
+    """
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index(name, 'todos', columns, sqlite_where=sa.text(sqlite_where))
+        return
+    column_list = ', '.join(columns)
+    with op.get_context().autocommit_block():
+        partitions = bind.execute(sa.text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'todos'::regclass ORDER BY 1"
+        )).scalars().all()
+        if not partitions:
+            op.execute(f'CREATE INDEX CONCURRENTLY {name} ON todos ({column_list}) WHERE {postgresql_where}')
+            return
+        op.execute(f'CREATE INDEX {name} ON ONLY todos ({column_list}) WHERE {postgresql_where}')
+        for partition in partitions:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY {name}_{partition} ON {partition} ({column_list}) '
+                f'WHERE {postgresql_where}'
+            )
+            op.execute(f'ALTER INDEX {name} ATTACH PARTITION {name}_{partition}')
+
+
+def upgrade() -> None:
+    # Added without a default: SQLite cannot add a column with a non-constant
+    # one. The default is set before the backfill so rows inserted meanwhile
+    # get it; on SQLite the table is recreated for that.
+    op.add_column(
+        'todos',
+        sa.Column(
+            'updated_at',
+            sa.DateTime(timezone=True),
+            nullable=True,
+            comment='Last write; completed todos older than the archive age are moved out'
+        )
+    )
+    with op.batch_alter_table('todos') as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(timezone=True), server_default=sa.func.now())
+
+    # Existing rows start ageing from the migration. Committed id-range
+    # batches keep row locks short on a large table.
+    migrated_at = datetime.now(timezone.utc)
+    with op.get_context().autocommit_block():
+        bounds = op.get_bind().execute(sa.text('SELECT min(id), max(id) FROM todos')).one()
+        if bounds[0] is not None:
+            for low in range(bounds[0] - 1, bounds[1], BACKFILL_BATCH_SIZE):
+                op.execute(sa.text(
+                    'UPDATE todos SET updated_at = :migrated_at '
+                    'WHERE id > :low AND id <= :high AND updated_at IS NULL'
+                ).bindparams(
+                    sa.bindparam('migrated_at', migrated_at, type_=sa.DateTime(timezone=True)),
+                    low=low,
+                    high=low + BACKFILL_BATCH_SIZE,
+                ))
+
+    _create_todos_index_online(
+        'ix_todos_archivable',
+        ['updated_at', 'id'],
+        postgresql_where='complete IS true AND deleted_at IS NULL',
+        sqlite_where='complete IS 1 AND deleted_at IS NULL',
+    )
+
+    op.create_table(
+        'todos_archive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=True),
+        sa.Column('complete', sa.Boolean(), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_todos_archive_owner_id_id', 'todos_archive', ['owner_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todos_archive_owner_id_id', table_name='todos_archive')
+    op.drop_table('todos_archive')
+    op.drop_index('ix_todos_archivable', table_name='todos')
+    with op.batch_alter_table('todos') as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,38 @@
+"""Add version to todos for optimistic concurrency
+
+Revision ID: c0afbd299606
+Revises: 154d4881d62a
+Create Date: 2026-10-19 10:02:17.554930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0afbd299606'
+down_revision: Union[str, None] = '154d4881d62a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant server default lets PostgreSQL add the column without
+    # rewriting the table.
+    op.add_column(
+        'todos',
+        sa.Column(
+            'version',
+            sa.Integer(),
+            nullable=False,
+            server_default='1',
+            comment='Incremented on every update; compared against If-Match'
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('todos', 'version')
@@ -0,0 +1,111 @@
+"""Add position to todos for manual ordering
+
+Existing todos keep their id order: each owner's todos are numbered in id
+order and given the shortest fractional index keys ("a0", "a1", ... "az",
+"b00", ...), the same keys ordering.generate_n_keys_between produces.
+
+Revision ID: c4d851217a74
+Revises: 16cb095c0159
+Create Date: 2026-10-19 16:24:37.905412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d851217a74'
+down_revision: Union[str, None] = '16cb095c0159'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BASE_62_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BACKFILL_BATCH_SIZE = 5000
+
+
+def _nth_key(n: int) -> str:
+    """The n-th (0-based) integer key: "a" + 1 digit, then "b" + 2 digits, ..."""
+    head, width = 0, 1
+    while n >= 62 ** width:
+        n -= 62 ** width
+        head += 1
+        width += 1
+    digits = ''
+    for _ in range(width):
+        n, digit = divmod(n, 62)
+        digits = BASE_62_DIGITS[digit] + digits
+    return chr(ord('a') + head) + digits
+
+
+def _position_type():
+    return sa.String().with_variant(sa.String(collation='C'), 'postgresql')
+
+
+def _create_todos_index_online(name: str, columns: list, postgresql_where: str, sqlite_where: str) -> None:
+    """Create a partial index on todos without blocking writes (as in 175ccb37ae84)."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index(name, 'todos', columns, sqlite_where=sa.text(sqlite_where))
+        return
+    column_list = ', '.join(columns)
+    with op.get_context().autocommit_block():
+        partitions = bind.execute(sa.text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'todos'::regclass ORDER BY 1"
+        )).scalars().all()
+        if not partitions:
+            op.execute(f'CREATE INDEX CONCURRENTLY {name} ON todos ({column_list}) WHERE {postgresql_where}')
+            return
+        op.execute(f'CREATE INDEX {name} ON ONLY todos ({column_list}) WHERE {postgresql_where}')
+        for partition in partitions:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY {name}_{partition} ON {partition} ({column_list}) '
+                f'WHERE {postgresql_where}'
+            )
+            op.execute(f'ALTER INDEX {name} ATTACH PARTITION {name}_{partition}')
+
+
+def upgrade() -> None:
+    op.add_column('todos', sa.Column('position', _position_type(), nullable=True,
+                                     comment='Fractional index key; lists are ordered by it'))
+    op.add_column('todos_archive', sa.Column('position', _position_type(), nullable=True))
+
+    # Number each owner's todos in id order, walking the table in committed
+    # id-range batches so no long transaction holds row locks. The running
+    # count per owner carries the rank across batches.
+    bind = op.get_bind()
+    update = sa.text('UPDATE todos SET position = :position WHERE id = :id AND owner_id = :owner_id')
+    ranks = {}
+    with op.get_context().autocommit_block():
+        bounds = bind.execute(sa.text('SELECT min(id), max(id) FROM todos')).one()
+        if bounds[0] is not None:
+            for low in range(bounds[0] - 1, bounds[1], BACKFILL_BATCH_SIZE):
+                rows = bind.execute(sa.text(
+                    'SELECT id, owner_id FROM todos '
+                    'WHERE id > :low AND id <= :high AND owner_id IS NOT NULL ORDER BY id'
+                ), {'low': low, 'high': low + BACKFILL_BATCH_SIZE}).all()
+                if not rows:
+                    continue
+                params = []
+                for todo_id, owner_id in rows:
+                    rank = ranks.get(owner_id, 0)
+                    ranks[owner_id] = rank + 1
+                    params.append({'id': todo_id, 'owner_id': owner_id, 'position': _nth_key(rank)})
+                op.execute('BEGIN')
+                bind.execute(update, params)
+                op.execute('COMMIT')
+
+    _create_todos_index_online(
+        'ix_todos_owner_position_live',
+        ['owner_id', 'position', 'id'],
+        postgresql_where='deleted_at IS NULL',
+        sqlite_where='deleted_at IS NULL',
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todos_owner_position_live', table_name='todos')
+    op.drop_column('todos_archive', 'position')
+    op.drop_column('todos', 'position')
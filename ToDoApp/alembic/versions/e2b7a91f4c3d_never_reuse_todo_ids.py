@@ -0,0 +1,45 @@
+"""Never reuse todo ids on SQLite
+
+Archiving deletes rows from todos; without AUTOINCREMENT SQLite hands the
+freed ids out again, and the archive copy of a reused id then collides
+with the one already in todos_archive. The sequence starts past every id
+in either table. PostgreSQL sequences never go back, so this is a no-op
+there.
+
+Revision ID: e2b7a91f4c3d
+Revises: c4d851217a74
+Create Date: 2026-10-19 18:02:11.530472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7a91f4c3d'
+down_revision: Union[str, None] = 'c4d851217a74'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('todos', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+    op.execute("DELETE FROM sqlite_sequence WHERE name = 'todos'")
+    op.execute(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'todos', max("
+        "(SELECT coalesce(max(id), 0) FROM todos), "
+        "(SELECT coalesce(max(id), 0) FROM todos_archive))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('todos', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
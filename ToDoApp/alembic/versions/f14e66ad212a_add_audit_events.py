@@ -0,0 +1,41 @@
+"""Add audit_events table
+
+Revision ID: f14e66ad212a
+Revises: 175ccb37ae84
+Create Date: 2026-10-19 14:02:51.640217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f14e66ad212a'
+down_revision: Union[str, None] = '175ccb37ae84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'audit_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('action', sa.String(), nullable=False),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('target', sa.String(), nullable=True),
+        sa.Column('ip_address', sa.String(), nullable=True),
+        sa.Column('detail', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_events_action_id', 'audit_events', ['action', 'id'], unique=False)
+    op.create_index('ix_audit_events_actor_id_id', 'audit_events', ['actor_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audit_events_actor_id_id', table_name='audit_events')
+    op.drop_index('ix_audit_events_action_id', table_name='audit_events')
+    op.drop_table('audit_events')
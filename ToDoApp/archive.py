@@ -0,0 +1,77 @@
+"""Move completed todos that haven't changed in a while into `todos_archive`.
+
+Keeping cold rows out of `todos` keeps the hot table and its indexes small;
+archived todos stay readable through `GET /todos/archive`.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, delete, func, insert, literal, select
+
+from . import models
+from .background import JobStats, PeriodicTask, run_batches
+from .database import SessionLocal
+
+# Completed todos untouched for this long are moved to the archive.
+ARCHIVE_AFTER = timedelta(days=int(os.environ.get("TODOAPP_ARCHIVE_AFTER_DAYS", "30")))
+ARCHIVE_BATCH_SIZE = int(os.environ.get("TODOAPP_ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_INTERVAL_SECONDS = 600
+ARCHIVE_BATCH_PAUSE_SECONDS = 0.5
+ARCHIVE_MAX_BATCHES_PER_RUN = 200
+
+ARCHIVED_COLUMNS = [column.name for column in models.Todos.__table__.columns]
+
+
+stats = JobStats("archived")
+
+
+def archive_batch(db, cutoff: datetime, now: datetime, batch_size: int | None = None):
+    """Move up to `batch_size` todos completed before `cutoff` in one transaction."""
+    if batch_size is None:
+        batch_size = ARCHIVE_BATCH_SIZE
+    todos = models.Todos.__table__
+    ids = db.scalars(
+        select(todos.c.id)
+        .where(
+            todos.c.complete.is_(True),
+            todos.c.deleted_at.is_(None),
+            todos.c.updated_at < cutoff,
+        )
+        # Oldest first, straight from ix_todos_archivable.
+        .order_by(todos.c.updated_at, todos.c.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        return 0
+    db.execute(
+        insert(models.TodosArchive).from_select(
+            [*ARCHIVED_COLUMNS, "archived_at"],
+            select(*(todos.c[name] for name in ARCHIVED_COLUMNS), literal(now, DateTime(timezone=True)))
+            .where(todos.c.id.in_(ids)),
+        )
+    )
+    db.execute(delete(todos).where(todos.c.id.in_(ids)))
+    db.commit()
+    return len(ids)
+
+
+def table_sizes(db):
+    """Row counts of the hot and archived todo tables."""
+    return {
+        "hot": db.scalar(select(func.count()).select_from(models.Todos)),
+        "archived": db.scalar(select(func.count()).select_from(models.TodosArchive)),
+    }
+
+
+def run_archive(session_factory=SessionLocal, now: datetime | None = None,
+                pause: float = ARCHIVE_BATCH_PAUSE_SECONDS):
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - ARCHIVE_AFTER
+    batch_size = ARCHIVE_BATCH_SIZE
+    with session_factory() as db:
+        return run_batches(lambda: archive_batch(db, cutoff, now, batch_size), batch_size, pause,
+                           ARCHIVE_MAX_BATCHES_PER_RUN, stats, now)
+
+
+archive_task = PeriodicTask("todo-archive", ARCHIVE_INTERVAL_SECONDS, run_archive, exclusive=True)
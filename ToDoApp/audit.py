@@ -0,0 +1,124 @@
+"""Audit trail for admin and auth actions.
+
+Events are queued in memory and written to `audit_events` in bulk by a
+background task, so recording one never adds a commit to the request. The
+queue is bounded: when the database falls behind, new events are dropped
+and counted rather than growing the process without limit.
+"""
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, select
+
+from . import models
+from .background import PeriodicTask
+from .database import SessionLocal
+
+AUDIT_QUEUE_SIZE = int(os.environ.get("TODOAPP_AUDIT_QUEUE_SIZE", "10000"))
+# Flush as soon as this many events are queued, else every AUDIT_FLUSH_SECONDS.
+AUDIT_FLUSH_SIZE = 500
+AUDIT_FLUSH_SECONDS = 2.0
+
+
+class AuditLog:
+    def __init__(self, session_factory=SessionLocal, max_size: int = AUDIT_QUEUE_SIZE,
+                 flush_size: int = AUDIT_FLUSH_SIZE):
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.flush_size = flush_size
+        self.on_full = None  # Called when `flush_size` events are waiting
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.flushes = 0
+
+    def record(self, action: str, actor_id: int | None = None, target: str | None = None,
+               detail: dict | None = None, ip_address: str | None = None):
+        """Queue an event; returns False if the queue is full and it was dropped."""
+        event = {
+            "created_at": datetime.now(timezone.utc),
+            "action": action,
+            "actor_id": actor_id,
+            "target": target,
+            "ip_address": ip_address,
+            "detail": detail,
+        }
+        with self._lock:
+            if len(self._events) >= self.max_size:
+                self.dropped += 1
+                return False
+            self._events.append(event)
+            self.recorded += 1
+            full = len(self._events) == self.flush_size
+        if full and self.on_full is not None:
+            self.on_full()
+        return True
+
+    def _take(self, count: int):
+        with self._lock:
+            return [self._events.popleft() for _ in range(min(count, len(self._events)))]
+
+    def _requeue(self, batch):
+        """Put a batch that failed to write back at the front, as far as it fits."""
+        with self._lock:
+            kept = batch[:max(0, self.max_size - len(self._events))]
+            self._events.extendleft(reversed(kept))
+            self.dropped += len(batch) - len(kept)
+
+    def flush(self):
+        """Write the events queued so far in bulk inserts; returns how many were written."""
+        written = 0
+        with self._flush_lock:
+            pending = len(self._events)
+            while written < pending:
+                batch = self._take(min(self.flush_size, pending - written))
+                if not batch:
+                    break
+                try:
+                    with self.session_factory() as db:
+                        db.execute(insert(models.AuditEvents), batch)
+                        db.commit()
+                except Exception:
+                    self._requeue(batch)
+                    raise
+                written += len(batch)
+                self.written += len(batch)
+                self.flushes += 1
+        return written
+
+    def stats(self):
+        return {
+            "queued": len(self._events),
+            "max_queued": self.max_size,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "written": self.written,
+            "flushes": self.flushes,
+        }
+
+
+def query_events(db, before_id: int | None = None, limit: int = 100, action: str | None = None,
+                 actor_id: int | None = None):
+    """Newest events first, starting below `before_id`."""
+    query = select(models.AuditEvents).order_by(models.AuditEvents.id.desc()).limit(limit)
+    if before_id is not None:
+        query = query.where(models.AuditEvents.id < before_id)
+    if action is not None:
+        query = query.where(models.AuditEvents.action == action)
+    if actor_id is not None:
+        query = query.where(models.AuditEvents.actor_id == actor_id)
+    return db.scalars(query).all()
+
+
+def client_ip(request):
+    return request.client.host if request.client else None
+
+
+audit_log = AuditLog()
+flush_task = PeriodicTask("audit-flush", AUDIT_FLUSH_SECONDS, audit_log.flush)
+audit_log.on_full = flush_task.wake
@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.exc import DBAPIError
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# "off" keeps this process from running the database-wide jobs at all, e.g.
+# on hosts where a separate process runs them.
+BACKGROUND_JOBS = os.environ.get("TODOAPP_BACKGROUND_JOBS", "on").lower() != "off"
+RUNNER_LOCK_KEY = 0x746F646F  # Arbitrary; shared by every worker of this app
+
+
+class JobRunner:
+    """Elects the one process that runs the database-wide jobs.
+
+    With `serve --workers N` every worker starts the same tasks. On PostgreSQL
+    the first worker to take a session-level advisory lock runs them; the lock
+    lives on a dedicated autocommit connection, so if that worker dies the
+    lock is released and another takes over on its next tick. Elsewhere
+    (SQLite, one process) every process is the runner.
+    """
+
+    def __init__(self, bind=engine, enabled: bool = BACKGROUND_JOBS, lock_key: int = RUNNER_LOCK_KEY):
+        self.bind = bind
+        self.enabled = enabled
+        self.lock_key = lock_key
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def is_runner(self):
+        """Whether this process runs the jobs; blocking, call it off the event loop."""
+        if not self.enabled:
+            return False
+        if self.bind.dialect.name != "postgresql":
+            return True
+        with self._lock:
+            if self._connection is not None:
+                try:
+                    self._connection.exec_driver_sql("SELECT 1")
+                    return True
+                except DBAPIError:
+                    self._release()
+            connection = self.bind.connect().execution_options(isolation_level="AUTOCOMMIT")
+            try:
+                acquired = connection.exec_driver_sql(f"SELECT pg_try_advisory_lock({self.lock_key})").scalar()
+            except DBAPIError:
+                connection.close()
+                raise
+            if not acquired:
+                connection.close()
+                return False
+            self._connection = connection
+            return True
+
+    @property
+    def elected(self):
+        """Whether this process was the runner when it last checked; never blocks."""
+        if not self.enabled:
+            return False
+        return self.bind.dialect.name != "postgresql" or self._connection is not None
+
+    def _release(self):
+        connection, self._connection = self._connection, None
+        if connection is not None:
+            try:
+                connection.close()
+            except DBAPIError:
+                pass
+
+    def release(self):
+        with self._lock:
+            self._release()
+
+    def forget(self):
+        # A forked child must not use (or close) the parent's connection.
+        self._connection = None
+        self._lock = threading.Lock()
+
+
+runner = JobRunner()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=runner.forget)
+
+
+class PeriodicTask:
+    """Run a blocking job every `interval` seconds on a worker thread.
+
+    An `exclusive` job works on shared database state and only runs in the
+    process elected by `runner`; the others skip it.
+    """
+
+    def __init__(self, name: str, interval: float, job, exclusive: bool = False):
+        self.name = name
+        self.interval = interval
+        self.job = job
+        self.exclusive = exclusive
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.to_thread(self._run_job)
+            except Exception:
+                logger.exception("Background task %s failed", self.name)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _run_job(self):
+        if self.exclusive and not runner.is_runner():
+            return
+        self.job()
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = self._loop.create_task(self._run(), name=self.name)
+
+    def wake(self):
+        """Run the job now rather than at the end of the interval; callable from any thread."""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+
+
+class JobStats:
+    """Run counters of a batched job, exposed by the admin status routes.
+
+    `rows` and `batches` name what the job counts, e.g. "purged" rows in
+    "batches", or "todos" rewritten across "owners".
+    """
+
+    def __init__(self, rows: str, batches: str = "batches"):
+        self.rows = rows
+        self.batches = batches
+        self.rows_total = 0
+        self.batches_total = 0
+        self.last_run_at = None
+        self.last_run_rows = 0
+        self.last_run_seconds = 0.0
+
+    def record_run(self, at, rows: int, seconds: float):
+        self.rows_total += rows
+        self.last_run_at = at
+        self.last_run_rows = rows
+        self.last_run_seconds = seconds
+
+    def to_dict(self):
+        return {
+            f"{self.rows}_total": self.rows_total,
+            f"{self.batches}_total": self.batches_total,
+            "last_run_at": self.last_run_at,
+            f"last_run_{self.rows}": self.last_run_rows,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_run_rows_per_second": (
+                round(self.last_run_rows / self.last_run_seconds, 1) if self.last_run_seconds else 0.0
+            ),
+        }
+
+
+def run_batches(batch, batch_size: int, pause: float, max_batches: int | None = None,
+                stats: JobStats | None = None, at=None):
+    """Call `batch()` until it handles fewer than `batch_size` rows.
+
+    Sleeps `pause` seconds between batches so the job never monopolises the
+    database, and stops after `max_batches` so one run stays bounded; the
+    rest waits for the next run. Returns the rows handled.
+    """
+    started = time.perf_counter()
+    handled = 0
+    for _ in range(max_batches) if max_batches is not None else itertools.count():
+        rows = batch()
+        handled += rows
+        if stats is not None:
+            stats.batches_total += 1
+        if rows < batch_size:
+            break
+        time.sleep(pause)
+    if stats is not None:
+        stats.record_run(at, handled, time.perf_counter() - started)
+    return handled
+
+
+tasks = []
+
+
+def register(task: PeriodicTask):
+    tasks.append(task)
+    return task
+
+
+async def start_all():
+    for task in tasks:
+        task.start()
+
+
+async def stop_all():
+    for task in tasks:
+        await task.stop()
+    await asyncio.to_thread(runner.release)
@@ -0,0 +1,95 @@
+"""Hot-table size and per-user list latency before and after archiving.
+
+Run with: python -m ToDoApp.benchmarks.bench_archive [DATABASE_URL]
+Defaults to an in-memory SQLite database; with a URL the schema is created
+in that (scratch!) database and its todos are archived.
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from ToDoApp import archive, models
+from ToDoApp.database import Base
+from ToDoApp.routers.todos import _list_todos_json
+
+USERS = 500
+TODOS_PER_USER = 200
+COLD_FRACTION = 0.8
+SAMPLES = 1_000
+
+
+def hot_table_bytes(db):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return db.scalar(text("SELECT pg_total_relation_size('todos')"))
+    if dialect == "sqlite":
+        return db.scalar(text(
+            "SELECT sum(pgsize) FROM dbstat WHERE name = 'todos' "
+            "OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'todos' AND type = 'index')"
+        ))
+    return None
+
+
+def load(session_factory, now):
+    old = now - archive.ARCHIVE_AFTER - timedelta(days=1)
+    with session_factory() as db:
+        rows = []
+        for owner_id in range(1, USERS + 1):
+            for i in range(TODOS_PER_USER):
+                cold = random.random() < COLD_FRACTION
+                rows.append({
+                    "title": f"Todo {i}", "description": f"Description of todo {i} " * 4,
+                    "priority": i % 5 + 1, "complete": cold, "owner_id": owner_id,
+                    "version": 1, "updated_at": old if cold else now,
+                })
+        db.execute(models.Todos.__table__.insert(), rows)
+        db.commit()
+
+
+def measure(session_factory):
+    timings = []
+    with session_factory() as db:
+        for _ in range(SAMPLES):
+            owner_id = random.randint(1, USERS)
+            start = time.perf_counter()
+            _list_todos_json(db, owner_id, None)
+            timings.append((time.perf_counter() - start) * 1000)
+        size = hot_table_bytes(db)
+        rows = archive.table_sizes(db)["hot"]
+    timings.sort()
+    return rows, size, statistics.median(timings), timings[int(len(timings) * 0.95)]
+
+
+def report(label, rows, size, p50, p95):
+    size_text = f"{size / 1024 / 1024:.1f} MiB" if size is not None else "n/a"
+    print(f"{label:>6}: {rows} hot rows, {size_text}  list p50 {p50:.3f} ms  p95 {p95:.3f} ms")
+
+
+def main():
+    if len(sys.argv) > 1:
+        engine = create_engine(sys.argv[1])
+    else:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    now = datetime.now(timezone.utc)
+
+    load(session_factory, now)
+    report("before", *measure(session_factory))
+    started = time.perf_counter()
+    archived = archive.run_archive(session_factory, now=now, pause=0)
+    print(f"archived {archived} todos in {time.perf_counter() - started:.2f} s")
+    # Give the freed pages back so the size reflects the smaller hot table.
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM FULL todos" if engine.dialect.name == "postgresql" else "VACUUM"))
+    report("after", *measure(session_factory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Rows/sec of the bulk importer compared with one commit per row.
+
+Run with: python -m ToDoApp.benchmarks.bench_bulk_import [DATABASE_URL]
+Defaults to a temporary SQLite file; pass a Postgres URL to exercise COPY.
+"""
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .. import bulk_import, models
+from ..database import Base
+
+TODO_ROWS = 100_000
+USER_ROWS = 200
+
+
+def todo_lines(count: int, owner_id: int):
+    return io.StringIO("\n".join(
+        json.dumps({"owner_id": owner_id, "title": f"Todo {i}", "description": f"Description {i}", "priority": i % 6 + 1})
+        for i in range(count)
+    ))
+
+
+def user_lines(count: int, prefix: str):
+    rows = ["username,password,email,first_name,last_name,role,phone_number"]
+    rows += [f"{prefix}{i},password{i},{prefix}{i}@example.com,First,Last,user,1234567890" for i in range(count)]
+    return io.StringIO("\n".join(rows))
+
+
+def per_row_todos(db, count: int, owner_id: int):
+    for i in range(count):
+        db.add(models.Todos(owner_id=owner_id, title=f"Todo {i}", description=f"Description {i}", priority=i % 6 + 1))
+        db.commit()
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    engine = create_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(models.Users(id=1, username="owner", email="owner@example.com", hashed_password="x", role="user"))
+    db.commit()
+
+    start = time.perf_counter()
+    per_row_todos(db, 2_000, 1)
+    print(f"todos one commit per row : {2_000 / (time.perf_counter() - start):>10.0f} rows/s")
+
+    report = bulk_import.import_todos(db, todo_lines(TODO_ROWS, 1), "ndjson")
+    print(f"todos bulk import        : {report.to_dict()['rows_per_second']:>10.0f} rows/s ({TODO_ROWS} rows)")
+
+    for processes in sorted({1, os.cpu_count() or 1}):
+        with bulk_import.new_hashing_pool(processes) as pool:
+            report = bulk_import.import_users(db, user_lines(USER_ROWS, f"p{processes}_"), "csv", pool)
+        print(f"users bulk, {processes:>2} processes: {report.to_dict()['rows_per_second']:>10.1f} rows/s ({USER_ROWS} rows)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
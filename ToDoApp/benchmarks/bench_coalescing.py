@@ -0,0 +1,78 @@
+"""DB query count for a burst of identical GET /admin/todo requests.
+
+Run with: python -m ToDoApp.benchmarks.bench_coalescing
+"""
+import asyncio
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from .. import models
+from ..coalesce import coalescer
+from ..database import Base
+from ..main import app
+from ..routers import auth
+
+TODOS = 5_000
+CONCURRENCY = (1, 10, 50, 200)
+
+
+def setup_database():
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/bench.db", connect_args={"check_same_thread": False},
+                           pool_size=50, max_overflow=200)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as db:
+        db.add(models.Users(id=1, username="admin", email="admin@example.com", hashed_password="x", role="admin"))
+        db.execute(models.Todos.__table__.insert(), [
+            {"title": f"Todo {i}", "description": "Description", "priority": i % 6 + 1, "complete": False, "owner_id": 1}
+            for i in range(TODOS)
+        ])
+        db.commit()
+    return engine, session_factory
+
+
+async def burst(client, concurrency: int):
+    responses = await asyncio.gather(*(client.get("/admin/todo") for _ in range(concurrency)))
+    assert all(response.status_code == 200 for response in responses)
+
+
+async def main():
+    engine, session_factory = setup_database()
+    selects = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal selects
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects += 1
+
+    def get_read_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[auth.get_current_user] = lambda: {"id": 1, "username": "admin", "role": "admin"}
+    app.dependency_overrides[auth.get_read_db] = get_read_db
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'concurrency':>11} {'coalescing':>10} {'queries':>8} {'wall ms':>8}")
+        for concurrency in CONCURRENCY:
+            for enabled in (False, True):
+                coalescer.enabled = enabled
+                selects = 0
+                start = time.perf_counter()
+                await burst(client, concurrency)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"{concurrency:>11} {'on' if enabled else 'off':>10} {selects:>8} {elapsed:>8.0f}")
+    print(coalescer.stats())
+    app.dependency_overrides = {}
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+"""Bytes vs CPU trade-off of response compression for todo list payloads.
+
+Run with: python -m ToDoApp.benchmarks.bench_compression
+"""
+import json
+import time
+
+from ..compression import available_encodings, compress
+
+SIZES = (1_000, 10_000, 100_000)
+LEVELS = {
+    "gzip": (1, 6, 9),
+    "zstd": (1, 3, 9, 19),
+    "br": (1, 4, 9),
+}
+
+
+def make_payload(count: int, fields=None) -> bytes:
+    todos = [
+        {
+            "id": i,
+            "title": f"Todo item {i}",
+            "description": f"Remember to follow up on task number {i} before the weekly sync",
+            "priority": i % 6 + 1,
+            "complete": i % 3 == 0,
+            "owner_id": i % 50 + 1,
+        }
+        for i in range(1, count + 1)
+    ]
+    if fields:
+        todos = [{field: todo[field] for field in fields} for todo in todos]
+    return json.dumps(todos).encode()
+
+
+def measure(body: bytes, encoding: str, level: int):
+    start = time.process_time()
+    compressed = compress(body, encoding, level)
+    return len(compressed), (time.process_time() - start) * 1000
+
+
+def main():
+    print(f"{'payload':>22} {'encoding':>8} {'level':>5} {'bytes':>11} {'ratio':>6} {'cpu ms':>8}")
+    for count in SIZES:
+        for label, fields in (("full", None), ("no description", ("id", "title", "priority", "complete"))):
+            body = make_payload(count, fields)
+            name = f"{count} {label}"
+            print(f"{name:>22} {'identity':>8} {'-':>5} {len(body):>11} {1.0:>6.2f} {0.0:>8.1f}")
+            for encoding in available_encodings():
+                for level in LEVELS[encoding]:
+                    size, cpu_ms = measure(body, encoding, level)
+                    print(f"{name:>22} {encoding:>8} {level:>5} {size:>11} {len(body) / size:>6.2f} {cpu_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
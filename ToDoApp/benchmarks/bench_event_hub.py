@@ -0,0 +1,65 @@
+"""Idle subscriber footprint and event throughput of the todo event hub.
+
+Run with: python -m ToDoApp.benchmarks.bench_event_hub
+"""
+import asyncio
+import time
+import tracemalloc
+
+from ..events import EventHub
+
+IDLE_SUBSCRIBERS = (1_000, 10_000, 50_000)
+USERS = 1_000
+EVENTS = 100_000
+
+
+async def idle_footprint(count: int):
+    hub = EventHub()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [hub.subscribe(i % USERS) for i in range(count)]
+    # Each idle SSE connection is one task parked on its queue.
+    waiters = [asyncio.create_task(subscription.get(timeout=3600)) for subscription in subscriptions]
+    await asyncio.sleep(0)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    return used / count
+
+
+async def throughput(subscribers_per_user: int):
+    hub = EventHub()
+    subscriptions = [hub.subscribe(i % USERS) for i in range(USERS * subscribers_per_user)]
+    received = 0
+
+    async def consume(subscription):
+        nonlocal received
+        while await subscription.get(timeout=0.5) is not None:
+            received += 1
+
+    consumers = [asyncio.create_task(consume(subscription)) for subscription in subscriptions]
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        hub.publish(i % USERS, "updated", {"id": i, "title": "Todo", "complete": True})
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    while received < hub.delivered and time.perf_counter() - start < 60:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*consumers)
+    resyncs = sum(subscription.resyncs for subscription in subscriptions)
+    return EVENTS / elapsed, hub.delivered / elapsed, resyncs
+
+
+async def main():
+    for count in IDLE_SUBSCRIBERS:
+        print(f"{count:>7} idle subscribers: {await idle_footprint(count):>7.0f} bytes each")
+    for per_user in (1, 4):
+        events, deliveries, resyncs = await throughput(per_user)
+        print(f"{per_user} subscriber(s)/user: {events:>9.0f} events/s, {deliveries:>9.0f} deliveries/s, {resyncs} resyncs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+"""Goodput under overload with and without admission control.
+
+Run with: python -m ToDoApp.benchmarks.bench_overload
+A sync endpoint holds one of POOL_SIZE "connections" for SERVICE_TIME, like a
+query on the connection pool. Requests arrive open-loop at 1x, 2x and 4x that
+capacity; goodput counts the responses that finished within SLO_SECONDS.
+"""
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from ..admission import AdmissionController, AdmissionMiddleware
+
+POOL_SIZE = 5
+SERVICE_TIME = 0.02
+SLO_SECONDS = 0.5
+DURATION_SECONDS = 3.0
+CAPACITY = POOL_SIZE / SERVICE_TIME
+
+
+def make_app(admission: bool):
+    app = FastAPI()
+    pool = threading.Semaphore(POOL_SIZE)
+
+    @app.get("/todos/")
+    def read_all():
+        with pool:
+            time.sleep(SERVICE_TIME)
+        return []
+
+    if admission:
+        app.add_middleware(AdmissionMiddleware, controller=AdmissionController(
+            enabled=True, default_deadline=2.0, route_deadlines={}))
+    return app
+
+
+async def run(app, rate: float):
+    latencies, rejected, failed = [], 0, 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            nonlocal rejected, failed
+            start = time.perf_counter()
+            response = await client.get("/todos/")
+            if response.status_code == 503:
+                rejected += 1
+            elif response.status_code != 200:
+                failed += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+        tasks = []
+        deadline = time.perf_counter() + DURATION_SECONDS
+        while time.perf_counter() < deadline:
+            tasks.append(asyncio.ensure_future(one()))
+            await asyncio.sleep(random.expovariate(rate))
+        await asyncio.gather(*tasks)
+    latencies.sort()
+    good = sum(1 for latency in latencies if latency <= SLO_SECONDS)
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else float("nan")
+    return len(tasks), good / DURATION_SECONDS, rejected, failed, p95
+
+
+def main():
+    print(f"capacity {CAPACITY:.0f} req/s, SLO {SLO_SECONDS * 1000:.0f} ms")
+    for load in (1, 2, 4):
+        for admission in (False, True):
+            sent, goodput, rejected, failed, p95 = asyncio.run(run(make_app(admission), CAPACITY * load))
+            label = "admission" if admission else "no limit "
+            print(f"{load}x {label}: {sent:5d} sent  goodput {goodput:6.1f} req/s  "
+                  f"503 {rejected:5d}  504 {failed:4d}  p95 {p95:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
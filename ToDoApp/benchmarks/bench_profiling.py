@@ -0,0 +1,53 @@
+"""Per-request cost of the profiling middleware: absent, idle and profiling.
+
+Run with: python -m ToDoApp.benchmarks.bench_profiling
+Calls a minimal ASGI app directly so the middleware is all that is measured.
+"""
+import asyncio
+import time
+
+from ..profiling import Profiler, ProfilingMiddleware
+
+REQUESTS = 20_000
+PROFILED_REQUESTS = 500
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/todos/",
+    "headers": [(b"host", b"testserver"), (b"accept", b"application/json"), (b"authorization", b"Bearer x")],
+}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def measure(app, requests: int):
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(SCOPE), receive, send)
+    return (time.perf_counter() - start) / requests * 1_000_000
+
+
+async def main():
+    baseline = await measure(endpoint, REQUESTS)
+    idle = await measure(ProfilingMiddleware(endpoint, Profiler(sample_rate=0.0)), REQUESTS)
+    sampled = await measure(ProfilingMiddleware(endpoint, Profiler(sample_rate=0.01)), REQUESTS)
+    profiled = await measure(ProfilingMiddleware(endpoint, Profiler(sample_rate=1.0)), PROFILED_REQUESTS)
+    print(f"no middleware:        {baseline:8.2f} us/request")
+    print(f"idle (rate 0):        {idle:8.2f} us/request  (+{idle - baseline:.2f})")
+    print(f"sampling 1%:          {sampled:8.2f} us/request  (+{sampled - baseline:.2f})")
+    print(f"every request:        {profiled:8.2f} us/request  (+{profiled - baseline:.2f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Per-lookup ORM overhead: a Query built per call vs a pre-built statement.
+
+Run with: python -m ToDoApp.benchmarks.bench_statements
+Uses in-memory SQLite so the time is almost all SQLAlchemy; "build only"
+is the statement construction and cache key, without executing anything.
+"""
+import time
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from .. import statements
+from ..database import Base
+from ..models import Todos, Users
+
+LOOKUPS = 20_000
+
+
+def seed(session_factory):
+    with session_factory() as db:
+        db.add_all(Users(id=i, username=f"user{i}", email=f"user{i}@example.com", hashed_password="x", role="user")
+                   for i in range(1, 101))
+        db.add_all(Todos(id=i, title=f"Todo {i}", description="Desc", priority=1, owner_id=i % 100 + 1)
+                   for i in range(1, 1001))
+        db.commit()
+
+
+def measure(lookup, calls: int = LOOKUPS):
+    start = time.perf_counter()
+    for i in range(calls):
+        lookup(i)
+    return (time.perf_counter() - start) / calls * 1_000_000
+
+
+def main():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(session_factory)
+
+    with session_factory() as db:
+        cases = {
+            "user by username": (
+                lambda i: db.query(Users).filter(Users.username == f"user{i % 100 + 1}").first(),
+                lambda i: db.scalars(statements.user_by_username, {"username": f"user{i % 100 + 1}"}).first(),
+            ),
+            "todo by id/owner": (
+                lambda i: db.query(Todos).filter(Todos.deleted_at.is_(None))
+                .filter(Todos.id == i % 1000 + 1, Todos.owner_id == (i % 1000 + 1) % 100 + 1).first(),
+                lambda i: db.scalars(statements.owned_live_todo,
+                                     {"id": i % 1000 + 1, "owner_id": (i % 1000 + 1) % 100 + 1}).first(),
+            ),
+        }
+        for name, (per_call, prebuilt) in cases.items():
+            measure(per_call, 1000)  # warm the compiled cache
+            before = measure(per_call)
+            after = measure(prebuilt)
+            print(f"{name:18s} Query per call {before:7.1f} us   pre-built {after:7.1f} us   "
+                  f"({(before - after) / before:.0%} less)")
+
+    build = measure(lambda i: select(Users).where(Users.username == f"user{i}")._generate_cache_key())
+    print(f"build only         select + cache key {build:7.1f} us per statement")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Requests/sec of `python -m ToDoApp.serve` with 1, 2, 4 and 8 workers.
+
+Run with: python -m ToDoApp.benchmarks.bench_workers [--path /todos/ --token JWT]
+Without a token the unauthenticated /openapi.json route is used, which
+measures the server and framework rather than the database.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import httpx
+
+WORKER_COUNTS = (1, 2, 4, 8)
+
+
+async def load(url: str, headers: dict, concurrency: int, duration: float):
+    completed = 0
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=30) as client:
+        async def worker():
+            nonlocal completed, errors
+            while time.perf_counter() < deadline:
+                response = await client.get(url)
+                if response.status_code == 200:
+                    completed += 1
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return completed / duration, errors
+
+
+def wait_until_ready(url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/openapi.json")
+    parser.add_argument("--token")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    base = f"http://127.0.0.1:{args.port}"
+    for workers in WORKER_COUNTS:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "ToDoApp.serve", "--port", str(args.port), "--workers", str(workers),
+             "--no-access-log", "--log-level", "warning"],
+            env={**os.environ},
+        )
+        try:
+            wait_until_ready(base + "/openapi.json")
+            rps, errors = asyncio.run(load(base + args.path, headers, args.concurrency, args.duration))
+            print(f"{workers} workers: {rps:>9.0f} req/s  ({errors} errors)")
+        finally:
+            server.send_signal(signal.SIGINT)
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
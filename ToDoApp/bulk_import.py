@@ -0,0 +1,319 @@
+"""Bulk import of users and todos from CSV or NDJSON.
+
+Rows are streamed, validated against the same request models the API uses,
+and inserted in chunks: COPY on Postgres, a single executemany elsewhere.
+Passwords are hashed in parallel across a process pool. The API shares one
+pool, started on first use with forkserver/spawn so its workers never
+inherit the server's threads, for the life of the app.
+
+Usage:
+    python -m ToDoApp.bulk_import users users.csv
+    python -m ToDoApp.bulk_import todos todos.ndjson --chunk-size 5000
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import models, ordering
+from .routers.auth import CreateUserRequest, bcrypt_context
+from .routers.todos import TodoRequest
+
+CHUNK_SIZE = 1000
+HASH_PROCESSES = int(os.environ.get("TODOAPP_IMPORT_PROCESSES", "0")) or os.cpu_count() or 1
+MAX_REPORTED_ERRORS = 1000
+FORMATS = ("csv", "ndjson")
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def add_error(self, line: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def to_dict(self):
+        elapsed = self.elapsed
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.inserted / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def detect_format(filename: str | None, default: str = "csv"):
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if filename and filename.lower().endswith(".csv"):
+        return "csv"
+    return default
+
+
+def iter_records(lines, fmt: str):
+    """Yield `(line_number, record, error)` for every input row."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, {key: value for key, value in record.items() if value != ""}, None
+        return
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _validation_message(exc: ValidationError):
+    return "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in exc.errors())
+
+
+def _user_rows(records, report: ImportReport):
+    for line_number, record, error in records:
+        report.processed += 1
+        if error:
+            report.add_error(line_number, error)
+            continue
+        try:
+            yield line_number, CreateUserRequest(**record)
+        except ValidationError as exc:
+            report.add_error(line_number, _validation_message(exc))
+
+
+def _todo_rows(records, report: ImportReport):
+    for line_number, record, error in records:
+        report.processed += 1
+        if error:
+            report.add_error(line_number, error)
+            continue
+        try:
+            owner_id = int(record.pop("owner_id"))
+        except (KeyError, TypeError, ValueError):
+            report.add_error(line_number, "owner_id: a valid integer is required")
+            continue
+        try:
+            todo = TodoRequest(**record)
+        except ValidationError as exc:
+            report.add_error(line_number, _validation_message(exc))
+            continue
+        yield line_number, {**todo.model_dump(), "owner_id": owner_id}
+
+
+def _chunks(iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _hash_password(password: str):
+    return bcrypt_context.hash(password)
+
+
+def _pool_context():
+    # Forking a process that runs threads copies their locks in whatever
+    # state they are in; forkserver and spawn start workers from scratch.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def new_hashing_pool(processes: int | None = None):
+    return ProcessPoolExecutor(max_workers=processes or HASH_PROCESSES, mp_context=_pool_context())
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    """The process pool shared by every import in this process."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = new_hashing_pool()
+        return _shared_pool
+
+
+def shutdown_hashing_pool():
+    global _shared_pool
+    with _shared_pool_lock:
+        pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _forget_pool_after_fork():
+    # The parent's workers belong to the parent; a forked child starts its own.
+    global _shared_pool, _shared_pool_lock
+    _shared_pool = None
+    _shared_pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_pool_after_fork)
+
+
+def _copy_rows(db: Session, table, rows):
+    """Load rows with COPY ... FROM STDIN; returns False if the driver can't."""
+    cursor = db.connection().connection.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        cursor.close()
+        return False
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    dbapi_error = db.get_bind().dialect.loaded_dbapi.Error
+    try:
+        cursor.copy_expert(statement, buffer)
+    except dbapi_error as exc:
+        # The raw cursor bypasses SQLAlchemy's error wrapping; wrap it so the
+        # caller rolls back and retries row by row as for any other insert.
+        raise DBAPIError.instance(statement, None, exc, dbapi_error) from exc
+    finally:
+        cursor.close()
+    return True
+
+
+def _insert_rows(db: Session, table, rows):
+    if db.get_bind().dialect.name == "postgresql" and _copy_rows(db, table, rows):
+        return
+    db.execute(table.insert(), rows)
+
+
+def _insert_chunk(db: Session, table, chunk, report: ImportReport):
+    """Insert one chunk; on failure retry row by row to pinpoint the bad rows."""
+    try:
+        _insert_rows(db, table, [row for _, row in chunk])
+        db.commit()
+        report.inserted += len(chunk)
+        return
+    except SQLAlchemyError:
+        db.rollback()
+    for line_number, row in chunk:
+        try:
+            with db.begin_nested():
+                db.execute(table.insert(), row)
+            report.inserted += 1
+        except SQLAlchemyError as exc:
+            report.add_error(line_number, str(exc.orig or exc).splitlines()[0])
+    db.commit()
+
+
+def import_users(db: Session, lines, fmt: str = "csv", pool: ProcessPoolExecutor | None = None,
+                 chunk_size: int = CHUNK_SIZE, progress=None):
+    """Import users, hashing passwords on `pool` (the shared pool by default)."""
+    report = ImportReport()
+    table = models.Users.__table__
+    pool = pool or hashing_pool()
+    processes = pool._max_workers
+    for chunk in _chunks(_user_rows(iter_records(lines, fmt), report), chunk_size):
+        hashes = pool.map(_hash_password, [request.password for _, request in chunk],
+                          chunksize=max(1, len(chunk) // (processes * 4)))
+        rows = [
+            (line_number, {
+                "username": request.username,
+                "email": request.email,
+                "first_name": request.first_name,
+                "last_name": request.last_name,
+                "role": request.role,
+                "phone_number": request.phone_number,
+                "hashed_password": hashed_password,
+                "is_active": True,
+            })
+            for (line_number, request), hashed_password in zip(chunk, hashes)
+        ]
+        _insert_chunk(db, table, rows, report)
+        if progress:
+            progress(report)
+    return report
+
+
+def _assign_positions(db: Session, chunk, last_positions: dict):
+    """Append imported todos after each owner's existing ones, in file order."""
+    for _, row in chunk:
+        owner_id = row["owner_id"]
+        if owner_id not in last_positions:
+            last_positions[owner_id] = ordering.last_position(db, owner_id)
+        last_positions[owner_id] = row["position"] = ordering.generate_key_between(last_positions[owner_id], None)
+
+
+def import_todos(db: Session, lines, fmt: str = "csv", chunk_size: int = CHUNK_SIZE, progress=None):
+    report = ImportReport()
+    table = models.Todos.__table__
+    last_positions = {}
+    for chunk in _chunks(_todo_rows(iter_records(lines, fmt), report), chunk_size):
+        _assign_positions(db, chunk, last_positions)
+        _insert_chunk(db, table, chunk, report)
+        if progress:
+            progress(report)
+    return report
+
+
+def main(argv=None):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk import users or todos from CSV/NDJSON.")
+    parser.add_argument("kind", choices=("users", "todos"))
+    parser.add_argument("path", help="Input file, or - for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension, else csv")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--processes", type=int, default=None, help="Password hashing processes (users only)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+
+    def progress(report):
+        print(f"processed={report.processed} inserted={report.inserted} failed={report.failed} "
+              f"rows/s={report.inserted / report.elapsed:.0f}", file=sys.stderr)
+
+    source = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    db = SessionLocal()
+    try:
+        if args.kind == "users":
+            with new_hashing_pool(args.processes) as pool:
+                report = import_users(db, source, fmt, pool, args.chunk_size, progress)
+        else:
+            report = import_todos(db, source, fmt, args.chunk_size, progress)
+    finally:
+        db.close()
+        if source is not sys.stdin:
+            source.close()
+    print(json.dumps(report.to_dict(), indent=2))
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
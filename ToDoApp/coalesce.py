@@ -0,0 +1,79 @@
+"""Single-flight coalescing of identical concurrent reads.
+
+Requests with the same key that arrive while a query for that key is still
+running wait for that query instead of issuing their own, and all of them get
+the same serialized response body.
+"""
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args):
+        """Run `fn(*args)` in the threadpool unless a call for `key` is already in flight.
+
+        Keys are `(route, scope, params)` tuples; `scope` is what `invalidate` matches.
+        """
+        self.calls += 1
+        if not self.enabled:
+            return await run_in_threadpool(fn, *args)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting client doesn't cancel the query for everyone else.
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every waiter went away
+
+    def invalidate(self, scope):
+        """Stop new requests in `scope` from joining reads that started before a write."""
+        for key in [key for key in self._inflight if key[1] == scope]:
+            del self._inflight[key]
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+            "in_flight": len(self._inflight),
+        }
+
+
+def with_session(session_factory, fn):
+    """Wrap `fn(db, *args)` to run on a session of its own, closed when it returns.
+
+    A shared call must not use the first caller's request-scoped session: if
+    that client disconnects, the session is closed under the running query.
+    """
+    def call(*args):
+        db = session_factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return call
+
+
+def render_json(content) -> bytes:
+    """Serialize like FastAPI's default JSONResponse, once per flight."""
+    return JSONResponse(content).body
+
+
+coalescer = SingleFlight()
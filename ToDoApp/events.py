@@ -0,0 +1,96 @@
+"""In-process pub/sub of todo changes, fanned out per user.
+
+Every subscriber gets a bounded queue. A subscriber that falls behind has its
+backlog discarded and receives a single `resync` event, telling the client to
+refetch its list instead of replaying what it missed.
+"""
+import asyncio
+import itertools
+import json
+from collections import defaultdict
+
+from fastapi.encoders import jsonable_encoder
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    def __init__(self, user_id, queue_size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def push(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event["id"], "type": "resync", "data": None})
+            self.resyncs += 1
+
+    async def get(self, timeout: float | None = None):
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventHub:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._ids = itertools.count(1)
+        self._loop = None
+        self.published = 0
+        self.delivered = 0
+
+    def subscribe(self, user_id):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id, event_type: str, data):
+        """Queue an event for every subscriber of `user_id`; never blocks."""
+        if user_id not in self._subscribers:
+            return
+        event = {"id": next(self._ids), "type": event_type, "data": jsonable_encoder(data)}
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Called from a worker thread; hand over to the event loop.
+            self._loop.call_soon_threadsafe(self._deliver, user_id, event)
+            return
+        self._deliver(user_id, event)
+
+    def _deliver(self, user_id, event):
+        self.published += 1
+        for subscription in tuple(self._subscribers.get(user_id, ())):
+            subscription.push(event)
+            self.delivered += 1
+
+    def stats(self):
+        return {
+            "users": len(self._subscribers),
+            "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+hub = EventHub()
@@ -0,0 +1,150 @@
+"""Idempotency-Key support for retried POST/PUT requests.
+
+The first request with a key stores its response in `idempotency_keys` in the
+same transaction as its write; retries within the TTL get that response back
+without touching the tables (or bcrypt) again. Recent keys are also kept in a
+small in-process LRU so most retries skip the database entirely.
+"""
+import hashlib
+import hmac
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from fastapi import Header, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .background import PeriodicTask, run_batches
+from .database import SessionLocal
+
+IDEMPOTENCY_TTL = timedelta(hours=int(os.environ.get("TODOAPP_IDEMPOTENCY_TTL_HOURS", "24")))
+CACHE_SIZE = 10_000
+SWEEP_BATCH_SIZE = 1000
+SWEEP_INTERVAL_SECONDS = 300
+
+idempotency_header = Header(
+    default=None,
+    max_length=255,
+    description="Client-chosen unique key; retries with the same key return the original response",
+)
+
+
+class StoredResponse:
+    def __init__(self, request_hash: str, status_code: int, body: bytes, expires_at: datetime):
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.body = body
+        self.expires_at = expires_at
+
+    def replay(self):
+        return Response(
+            content=self.body,
+            status_code=self.status_code,
+            media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+
+def scoped_key(operation: str, scope, key: str):
+    """Keys are only unique per operation and caller."""
+    return f"{operation}:{scope}:{key}"
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def secret_digest(secret_key: str, value: str) -> str:
+    """HMAC of a secret field, so it is part of a fingerprint without being stored."""
+    return hmac.new(secret_key.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: timedelta = IDEMPOTENCY_TTL, cache_size: int = CACHE_SIZE):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def _remember(self, key: str, stored: StoredResponse):
+        self._cache[key] = stored
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _check(self, stored: StoredResponse, request_hash: str):
+        if stored.request_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        return stored
+
+    def lookup(self, db, key: str, request_hash: str):
+        """Return the stored response for `key`, or None if this is the first attempt."""
+        now = datetime.now(timezone.utc)
+        stored = self._cache.get(key)
+        if stored is not None and stored.expires_at > now:
+            return self._check(stored, request_hash)
+        row = db.scalars(
+            select(models.IdempotencyKeys).where(models.IdempotencyKeys.key == key)
+        ).first()
+        if row is None or _aware(row.expires_at) <= now:
+            return None
+        stored = StoredResponse(row.request_hash, row.status_code, row.response_body.encode(), _aware(row.expires_at))
+        self._remember(key, stored)
+        return self._check(stored, request_hash)
+
+    def commit(self, db, key: str, request_hash: str, status_code: int, content):
+        """Commit the pending write together with its stored response.
+
+        If a concurrent attempt with the same key committed first, the pending
+        write is rolled back and that attempt's response is returned instead.
+        """
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+        expires_at = datetime.now(timezone.utc) + self.ttl
+        db.add(models.IdempotencyKeys(
+            key=key,
+            request_hash=request_hash,
+            status_code=status_code,
+            response_body=body,
+            expires_at=expires_at,
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            stored = self.lookup(db, key, request_hash)
+            if stored is None:
+                raise
+            return stored
+        self._remember(key, StoredResponse(request_hash, status_code, body.encode(), expires_at))
+        return None
+
+
+def _aware(value: datetime):
+    # SQLite hands back naive datetimes even for timezone-aware columns.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def sweep_expired(session_factory=SessionLocal, batch_size: int = SWEEP_BATCH_SIZE, pause: float = 0.1):
+    """Delete expired keys in batches; returns the number removed."""
+    def sweep_batch():
+        batch = (
+            select(models.IdempotencyKeys.key)
+            .where(models.IdempotencyKeys.expires_at < datetime.now(timezone.utc))
+            .limit(batch_size)
+        )
+        result = db.execute(
+            delete(models.IdempotencyKeys).where(models.IdempotencyKeys.key.in_(batch.scalar_subquery())),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return result.rowcount
+
+    with session_factory() as db:
+        return run_batches(sweep_batch, batch_size, pause)
+
+
+store = IdempotencyStore()
+sweep_task = PeriodicTask("idempotency-sweep", SWEEP_INTERVAL_SECONDS, sweep_expired, exclusive=True)
@@ -1,10 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from . import models
-from .database import engine
+from . import models, admission, archive, audit, background, bulk_import, idempotency, ordering, profiling, purge
+from .compression import CompressionMiddleware
+from .database import ReadYourWritesMiddleware, engine
 from .routers import auth, todos, admin, users
 
 
-app = FastAPI()
+background.register(purge.purge_task)
+background.register(idempotency.sweep_task)
+background.register(archive.archive_task)
+background.register(audit.flush_task)
+background.register(ordering.rebalance_task)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await background.start_all()
+    yield
+    await background.stop_all()
+    # Write out audit events still queued in memory.
+    await asyncio.to_thread(audit.audit_log.flush)
+    await asyncio.to_thread(bulk_import.shutdown_hashing_pool)
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware, profiler=profiling.profiler)
+# Outermost, so rejected requests cost as little as possible.
+app.add_middleware(admission.AdmissionMiddleware, controller=admission.controller)
 
 def create_db_and_tables():
     models.Base.metadata.create_all(bind=engine)
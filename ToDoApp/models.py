@@ -1,4 +1,4 @@
-from sqlalchemy import ForeignKey, Integer, String, Boolean, Column
+from sqlalchemy import and_, BigInteger, ForeignKey, Integer, JSON, String, Boolean, Column, DateTime, Index, Text, func
 from .database import Base
 
 class Users(Base):
@@ -25,7 +25,103 @@ class Todos(Base):
     description = Column(String)
     priority = Column(Integer)  # Default priority set to 1
     complete = Column(Boolean, default=False)
-    owner_id = Column(Integer, ForeignKey("users.id"))  # Foreign key to Users table
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # Foreign key to Users table
+    deleted_at = Column(DateTime(timezone=True), nullable=True)  # Set on soft delete, purged later
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every update
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # Drives archiving
+    # Fractional index key (see ordering.py); compared byte-wise, hence the "C" collation.
+    position = Column(String().with_variant(String(collation="C"), "postgresql"))
+
+    __table_args__ = (
+        # Only live rows are indexed, so tombstones don't slow down list reads.
+        # complete and priority let per-user counts be answered from the index alone.
+        Index(
+            "ix_todos_owner_status_live",
+            owner_id,
+            complete,
+            priority,
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+        # Ordered lists (and the owner's last position) come straight from the
+        # index; id breaks ties between equal keys from concurrent appends.
+        Index(
+            "ix_todos_owner_position_live",
+            owner_id,
+            position,
+            id,
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+        # Tombstones only, for the purge job.
+        Index(
+            "ix_todos_deleted_at",
+            deleted_at,
+            postgresql_where=deleted_at.is_not(None),
+            sqlite_where=deleted_at.is_not(None),
+        ),
+        # Candidates for the archive job, oldest first; everything else is left out.
+        Index(
+            "ix_todos_archivable",
+            updated_at,
+            id,
+            postgresql_where=and_(complete.is_(True), deleted_at.is_(None)),
+            sqlite_where=and_(complete.is_(True), deleted_at.is_(None)),
+        ),
+        # Archived ids must never be handed out again.
+        {"sqlite_autoincrement": True},
+    )
+    # On PostgreSQL the table may be hash-partitioned by owner_id; including it
+    # in the ORM identity lets refreshes and flushes prune to one partition.
+    __mapper_args__ = {"primary_key": [id, owner_id]}
 
     def __str__(self):
-        return f"Todos(id={self.id}, title={self.title}, complete={self.complete})"
\ No newline at end of file
+        return f"Todos(id={self.id}, title={self.title}, complete={self.complete})"
+
+class TodosArchive(Base):
+    __tablename__ = "todos_archive"
+
+    # Same columns as Todos; rows are moved here by the archive job.
+    id = Column(Integer, primary_key=True)
+    title = Column(String)
+    description = Column(String)
+    priority = Column(Integer)
+    complete = Column(Boolean)
+    owner_id = Column(Integer, ForeignKey("users.id"))
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True))
+    position = Column(String().with_variant(String(collation="C"), "postgresql"))
+    archived_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Keyset pagination of a user's archive: WHERE owner_id = ? AND id > ? ORDER BY id
+        Index("ix_todos_archive_owner_id_id", owner_id, id),
+    )
+
+class IdempotencyKeys(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)  # "<operation>:<scope>:<Idempotency-Key header>"
+    request_hash = Column(String, nullable=False)  # Detects a key reused for a different payload
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)  # JSON returned to retries
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class AuditEvents(Base):
+    __tablename__ = "audit_events"
+
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns.
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)  # When the action happened, not when it was flushed
+    action = Column(String, nullable=False)  # e.g. "auth.login", "admin.delete_todo"
+    actor_id = Column(Integer)  # User who acted; NULL for failed logins
+    target = Column(String)  # e.g. "todo:42"
+    ip_address = Column(String)
+    detail = Column(JSON)
+
+    __table_args__ = (
+        # Keyset pagination (WHERE id < ? ORDER BY id DESC) filtered by action or actor.
+        Index("ix_audit_events_action_id", action, id),
+        Index("ix_audit_events_actor_id_id", actor_id, id),
+    )
@@ -0,0 +1,253 @@
+"""Manual ordering of todos with fractional indexing.
+
+Every todo has a `position` key; lists are ordered by it. Moving a todo gives
+it a new key between its new neighbours, so a move writes one row however
+long the list is. Keys are base-62 strings that compare byte-wise (the
+"C" collation on PostgreSQL): an integer part whose first character encodes
+its length, followed by a fraction that never ends in "0". This is the
+scheme of rocicorp's `fractional-indexing`.
+
+Repeated moves into the same gap lengthen keys; a background task rewrites
+the positions of owners whose keys got too long.
+"""
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, func, or_, select, union, update
+
+from . import models
+from .background import JobStats, PeriodicTask
+from .database import SessionLocal
+
+BASE_62_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+INTEGER_ZERO = "a0"
+SMALLEST_INTEGER = "A" + BASE_62_DIGITS[0] * 26
+
+# Keys longer than this are compacted by the rebalance task.
+REBALANCE_KEY_LENGTH = int(os.environ.get("TODOAPP_REBALANCE_KEY_LENGTH", "32"))
+REBALANCE_INTERVAL_SECONDS = 600
+REBALANCE_OWNERS_PER_RUN = 100
+
+
+def midpoint(a: str, b: str | None, digits: str = BASE_62_DIGITS):
+    """A fraction strictly between fractions `a` and `b` (None is 1)."""
+    zero = digits[0]
+    if b is not None and a >= b:
+        raise ValueError(f"{a!r} >= {b!r}")
+    if a[-1:] == zero or (b and b[-1:] == zero):
+        raise ValueError("fractions must not end in zero")
+    if b:
+        # Skip the common prefix; `a` is padded with zeros.
+        n = 0
+        while (a[n] if n < len(a) else zero) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + midpoint(a[n:], b[n:], digits)
+    digit_a = digits.index(a[0]) if a else 0
+    digit_b = digits.index(b[0]) if b is not None else len(digits)
+    if digit_b - digit_a > 1:
+        return digits[(digit_a + digit_b + 1) // 2]
+    if b and len(b) > 1:
+        return b[0]
+    return digits[digit_a] + midpoint(a[1:], None, digits)
+
+
+def integer_length(head: str):
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"invalid order key head: {head!r}")
+
+
+def integer_part(key: str):
+    length = integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"invalid order key: {key!r}")
+    return key[:length]
+
+
+def validate_order_key(key: str):
+    if key == SMALLEST_INTEGER:
+        raise ValueError(f"invalid order key: {key!r}")
+    if key[len(integer_part(key)):][-1:] == BASE_62_DIGITS[0]:
+        raise ValueError(f"invalid order key: {key!r}")
+
+
+def increment_integer(x: str, digits: str = BASE_62_DIGITS):
+    head, tail = x[0], list(x[1:])
+    for i in reversed(range(len(tail))):
+        d = digits.index(tail[i]) + 1
+        if d < len(digits):
+            tail[i] = digits[d]
+            return head + "".join(tail)
+        tail[i] = digits[0]
+    if head == "Z":
+        return "a" + digits[0]
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        tail.append(digits[0])
+    else:
+        tail.pop()
+    return head + "".join(tail)
+
+
+def decrement_integer(x: str, digits: str = BASE_62_DIGITS):
+    head, tail = x[0], list(x[1:])
+    for i in reversed(range(len(tail))):
+        d = digits.index(tail[i]) - 1
+        if d >= 0:
+            tail[i] = digits[d]
+            return head + "".join(tail)
+        tail[i] = digits[-1]
+    if head == "a":
+        return "Z" + digits[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        tail.append(digits[-1])
+    else:
+        tail.pop()
+    return head + "".join(tail)
+
+
+def generate_key_between(a: str | None, b: str | None, digits: str = BASE_62_DIGITS):
+    """A key that sorts after `a` and before `b`; None means unbounded."""
+    if a is not None:
+        validate_order_key(a)
+    if b is not None:
+        validate_order_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} >= {b!r}")
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        int_b = integer_part(b)
+        if int_b == SMALLEST_INTEGER:
+            return int_b + midpoint("", b[len(int_b):], digits)
+        if int_b < b:
+            return int_b
+        key = decrement_integer(int_b, digits)
+        if key is None:
+            raise ValueError("cannot decrement any more")
+        return key
+    int_a = integer_part(a)
+    frac_a = a[len(int_a):]
+    if b is None:
+        key = increment_integer(int_a, digits)
+        return int_a + midpoint(frac_a, None, digits) if key is None else key
+    int_b = integer_part(b)
+    if int_a == int_b:
+        return int_a + midpoint(frac_a, b[len(int_b):], digits)
+    key = increment_integer(int_a, digits)
+    if key is None:
+        raise ValueError("cannot increment any more")
+    if key < b:
+        return key
+    return int_a + midpoint(frac_a, None, digits)
+
+
+def generate_n_keys_between(a: str | None, b: str | None, n: int, digits: str = BASE_62_DIGITS):
+    """`n` ascending keys between `a` and `b`, as short as possible."""
+    if n == 0:
+        return []
+    if n == 1:
+        return [generate_key_between(a, b, digits)]
+    if b is None:
+        keys = [generate_key_between(a, b, digits)]
+        for _ in range(n - 1):
+            keys.append(generate_key_between(keys[-1], b, digits))
+        return keys
+    if a is None:
+        keys = [generate_key_between(a, b, digits)]
+        for _ in range(n - 1):
+            keys.append(generate_key_between(a, keys[-1], digits))
+        return keys[::-1]
+    mid = n // 2
+    key = generate_key_between(a, b, digits)
+    return [*generate_n_keys_between(a, key, mid, digits), key,
+            *generate_n_keys_between(key, b, n - mid - 1, digits)]
+
+
+def last_position(db, owner_id: int, lock: bool = False):
+    """The highest position among the owner's live todos, read off the index.
+
+    With `lock`, concurrent appends for the same owner are serialized until
+    the transaction ends: the owner's users row is locked first (FOR NO KEY
+    UPDATE, which inserts referencing it don't wait for), so the max is read
+    after any earlier append has committed.
+    """
+    if lock:
+        db.scalar(select(models.Users.id).where(models.Users.id == owner_id).with_for_update(key_share=True))
+    return db.scalar(
+        select(func.max(models.Todos.position))
+        .where(models.Todos.owner_id == owner_id, models.Todos.deleted_at.is_(None))
+    )
+
+
+stats = JobStats("todos", batches="owners")
+
+
+def owners_to_rebalance(db, max_length: int | None = None, limit: int | None = None):
+    """Owners with an overlong key, todos that have no position yet, or duplicate keys."""
+    if max_length is None:
+        max_length = REBALANCE_KEY_LENGTH
+    if limit is None:
+        limit = REBALANCE_OWNERS_PER_RUN
+    todos = models.Todos
+    live = (todos.deleted_at.is_(None), todos.owner_id.is_not(None))
+    unbalanced = select(todos.owner_id).where(
+        *live, or_(todos.position.is_(None), func.length(todos.position) > max_length),
+    )
+    # Equal keys come from appends or moves that raced each other.
+    duplicated = (
+        select(todos.owner_id)
+        .where(*live, todos.position.is_not(None))
+        .group_by(todos.owner_id, todos.position)
+        .having(func.count() > 1)
+    )
+    return db.scalars(union(unbalanced, duplicated).limit(limit)).all()
+
+
+def rebalance_owner(db, owner_id: int):
+    """Rewrite one owner's positions as the shortest keys in the current order."""
+    todos = models.Todos.__table__
+    rows = db.execute(
+        select(todos.c.id, todos.c.position)
+        .where(todos.c.owner_id == owner_id, todos.c.deleted_at.is_(None))
+        .order_by(todos.c.position.asc().nulls_last(), todos.c.id)
+        .with_for_update()
+    ).all()
+    keys = generate_n_keys_between(None, None, len(rows))
+    changed = [
+        {"b_id": row.id, "b_owner_id": owner_id, "b_position": key}
+        for row, key in zip(rows, keys) if row.position != key
+    ]
+    if changed:
+        db.execute(
+            update(todos)
+            .where(todos.c.id == bindparam("b_id"), todos.c.owner_id == bindparam("b_owner_id"))
+            # Reordering is not an edit: keep updated_at so archiving isn't postponed.
+            .values(position=bindparam("b_position"), updated_at=todos.c.updated_at),
+            changed,
+        )
+    db.commit()
+    return len(changed)
+
+
+def run_rebalance(session_factory=SessionLocal):
+    started = time.perf_counter()
+    rewritten = 0
+    with session_factory() as db:
+        for owner_id in owners_to_rebalance(db):
+            rewritten += rebalance_owner(db, owner_id)
+            stats.batches_total += 1
+    stats.record_run(datetime.now(timezone.utc), rewritten, time.perf_counter() - started)
+    return rewritten
+
+
+rebalance_task = PeriodicTask("todo-rebalance", REBALANCE_INTERVAL_SECONDS, run_rebalance, exclusive=True)
@@ -0,0 +1,276 @@
+"""On-demand request profiling.
+
+A configurable fraction of requests (`TODOAPP_PROFILE_SAMPLE_RATE`, default 0)
+plus any request an admin sends with an `X-Profile: 1` header is profiled:
+
+* one shared sampler thread records the stacks of the threads working on
+  each profiled request every `PROFILE_INTERVAL_SECONDS`, folded into collapsed stacks
+  (`frame;frame;frame count`, the input format of flamegraph.pl/speedscope);
+* every SQL statement the request runs is timed on the engine's cursor events.
+
+Profiles are kept in a bounded ring buffer served by `/admin/profiles`. A
+request that is not profiled costs one header scan and one random number.
+The server-sent event stream (`/todos/stream`) is never profiled.
+
+Routes are async, so the event loop thread is sampled along with the
+threadpool threads that run the request's queries; samples from other
+requests sharing those threads are included as well.
+"""
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from jose import jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers
+
+from .routers.auth import ALGORITHM, SECRET_KEY
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("TODOAPP_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_BUFFER_SIZE = int(os.environ.get("TODOAPP_PROFILE_BUFFER_SIZE", "100"))
+PROFILE_INTERVAL_SECONDS = 0.005
+PROFILE_HEADER = b"x-profile"
+# Reading profiles must not push the ones being read out of the buffer, and a
+# streaming response would keep its profile (and the sampler) running for as
+# long as the client stays connected.
+EXCLUDED_PATHS = ("/admin/profiles", "/todos/stream")
+MAX_STACK_DEPTH = 128
+MAX_STATEMENTS = 1000
+MAX_STATEMENT_LENGTH = 500
+
+_current_profile = ContextVar("current_profile", default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame, max_depth: int = MAX_STACK_DEPTH):
+    """Root-first `;`-joined frame labels of `frame`'s stack."""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class RequestProfile:
+    def __init__(self, profile_id: int, method: str, path: str, trigger: str, interval: float):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.interval = interval
+        self.started_at = datetime.now(timezone.utc)
+        self.status_code = None
+        self.duration = None
+        self.stacks = Counter()
+        self.statements = []
+        self.thread_ids = {threading.get_ident()}
+        self._started = time.perf_counter()
+
+    def sample(self, frames):
+        for thread_id in list(self.thread_ids):
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def stop(self, status_code):
+        self.status_code = status_code
+        self.duration = time.perf_counter() - self._started
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self._started) * 1000, 3)
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "samples": sum(self.stacks.values()),
+            "sql_statements": len(self.statements),
+            "sql_ms": round(sum(statement["duration_ms"] for statement in self.statements), 3),
+        }
+
+    def to_dict(self):
+        return {
+            **self.summary(),
+            "interval_ms": self.interval * 1000,
+            "stacks": self.collapsed(),
+            "sql": self.statements,
+        }
+
+
+class Sampler:
+    """One daemon thread sampling every request currently being profiled.
+
+    The thread is started on first use and sleeps on an event while nothing
+    is being profiled. Adding and removing profiles never waits for it
+    beyond a single sampling pass.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.add(profile)
+            # Also restarts the thread in a forked worker.
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, profile: RequestProfile):
+        # Once this returns the profile is no longer written to.
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._wakeup.clear()
+            self._wakeup.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for profile in self._profiles:
+                    profile.sample(frames)
+            del frames
+
+
+class Profiler:
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, buffer_size: int = PROFILE_BUFFER_SIZE,
+                 interval: float = PROFILE_INTERVAL_SECONDS):
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.profiles = deque(maxlen=buffer_size)
+        self._ids = itertools.count(1)
+        self._sampler = Sampler(interval)
+
+    def trigger(self, scope):
+        """Why this request should be profiled, or None."""
+        if scope["path"].startswith(EXCLUDED_PATHS):
+            return None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER and value not in (b"", b"0"):
+                if _is_admin(scope):
+                    return "header"
+                break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    def begin(self, scope, trigger: str):
+        profile = RequestProfile(next(self._ids), scope["method"], scope["path"], trigger, self.interval)
+        self._sampler.add(profile)
+        return profile
+
+    def finish(self, profile: RequestProfile, status_code):
+        self._sampler.remove(profile)
+        profile.stop(status_code)
+        self.profiles.append(profile)
+
+    def get(self, profile_id: int):
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def settings(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "buffer_size": self.profiles.maxlen,
+            "interval_ms": self.interval * 1000,
+        }
+
+
+def _is_admin(scope):
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.JWTError:
+        return False
+    return str(payload.get("role", "")).lower() == "admin"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.thread_ids.add(threading.get_ident())
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None or not conn.info.get("profile_query_start"):
+        return
+    duration = time.perf_counter() - conn.info["profile_query_start"].pop()
+    if len(profile.statements) < MAX_STATEMENTS:
+        profile.statements.append({
+            "statement": statement[:MAX_STATEMENT_LENGTH],
+            "start_ms": round(profile.elapsed_ms() - duration * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "rows": cursor.rowcount,
+        })
+
+
+class ProfilingMiddleware:
+    """Profile sampled requests and admin requests with an `X-Profile` header."""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self.profiler.trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = None
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profile = self.profiler.begin(scope, trigger)
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            self.profiler.finish(profile, status_code)
+
+
+profiler = Profiler()
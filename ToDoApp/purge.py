@@ -0,0 +1,70 @@
+"""Hard-delete soft-deleted todos in throttled batches, off-peak."""
+import os
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+
+from . import models
+from .background import JobStats, PeriodicTask, run_batches
+from .database import SessionLocal
+
+PURGE_BATCH_SIZE = int(os.environ.get("TODOAPP_PURGE_BATCH_SIZE", "500"))
+# Off-peak window as UTC hours "start-end"; the end hour is exclusive.
+PURGE_WINDOW = tuple(int(hour) for hour in os.environ.get("TODOAPP_PURGE_WINDOW", "1-5").split("-"))
+# Tombstones are kept at least this long before they are purged.
+PURGE_RETENTION = timedelta(minutes=int(os.environ.get("TODOAPP_PURGE_RETENTION_MINUTES", "60")))
+PURGE_INTERVAL_SECONDS = 60
+PURGE_BATCH_PAUSE_SECONDS = 0.5
+PURGE_MAX_BATCHES_PER_RUN = 200
+
+
+stats = JobStats("purged")
+
+
+def in_window(now: datetime, window=None):
+    start, end = window or PURGE_WINDOW
+    if start <= end:
+        return start <= now.hour < end
+    return now.hour >= start or now.hour < end
+
+
+def purge_batch(db, cutoff: datetime, batch_size: int | None = None):
+    """Hard-delete up to `batch_size` todos tombstoned before `cutoff`."""
+    if batch_size is None:
+        batch_size = PURGE_BATCH_SIZE
+    batch = (
+        select(models.Todos.id)
+        .where(models.Todos.deleted_at.is_not(None), models.Todos.deleted_at < cutoff)
+        .order_by(models.Todos.deleted_at)
+        .limit(batch_size)
+        # Another purger (or a write to a tombstone) never blocks this one.
+        .with_for_update(skip_locked=True)
+    )
+    result = db.execute(
+        delete(models.Todos).where(models.Todos.id.in_(batch.scalar_subquery())),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+    return result.rowcount
+
+
+def backlog(db, cutoff: datetime | None = None):
+    query = select(func.count()).select_from(models.Todos).where(models.Todos.deleted_at.is_not(None))
+    if cutoff is not None:
+        query = query.where(models.Todos.deleted_at < cutoff)
+    return db.scalar(query)
+
+
+def run_purge(session_factory=SessionLocal, now: datetime | None = None, force: bool = False,
+              pause: float = PURGE_BATCH_PAUSE_SECONDS):
+    now = now or datetime.now(timezone.utc)
+    if not force and not in_window(now):
+        return 0
+    cutoff = now - PURGE_RETENTION
+    batch_size = PURGE_BATCH_SIZE
+    with session_factory() as db:
+        return run_batches(lambda: purge_batch(db, cutoff, batch_size), batch_size, pause,
+                           PURGE_MAX_BATCHES_PER_RUN, stats, now)
+
+
+purge_task = PeriodicTask("todo-purge", PURGE_INTERVAL_SECONDS, run_purge, exclusive=True)
@@ -1,10 +1,18 @@
-from fastapi import APIRouter,Depends, HTTPException, status, Path
+import io
+from datetime import datetime, timezone
+from fastapi import APIRouter,Depends, HTTPException, status, Path, Query, Request, Response, UploadFile
+from fastapi.responses import PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from typing import Annotated
+from sqlalchemy import and_, case, func, or_, select
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-from .. import models
+from .. import models, admission, archive, audit, background, bulk_import, profiling, purge, statements
 from ..database import SessionLocal
-from .auth import get_current_user
+from ..coalesce import coalescer, render_json, with_session
+from .auth import get_current_user, read_db_dependency, read_session_factory_dependency
+from .todos import ADMIN_SCOPE, fields_query, live_todos, notify_write, parse_fields, select_fields
 
 
 router = APIRouter(
@@ -24,25 +32,246 @@ db_dependency = Annotated[Session, Depends(get_db)]
 user_dependency = Annotated[dict, Depends(get_current_user)]
 
 
+def _require_admin(user):
+    if user is None or user.get("role", "").lower() != "admin":
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
 @router.get("/todo", status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
+async def read_all(user: user_dependency, session_factory: read_session_factory_dependency,
+                   fields: str | None = fields_query):
     if user is None or user.get("role", "").lower() != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
-    return db.query(models.Todos).all()
+    selected = parse_fields(fields)
+    body = await coalescer.do(("admin_todo", ADMIN_SCOPE, tuple(selected or ())),
+                              with_session(session_factory, _all_todos_json), selected)
+    return Response(content=body, media_type="application/json")
+
+
+def _all_todos_json(db: Session, selected):
+    todos = live_todos(db).all()
+    if selected:
+        return render_json(jsonable_encoder([select_fields(todo, selected) for todo in todos]))
+    return render_json(jsonable_encoder(todos))
+
+PRIORITIES = range(1, 7)  # TodoRequest.priority is 1-6
+USER_SORTS = ("id", "total", "open")
+
+
+def user_directory_query(sort: str, limit: int, after_value: int | None, after_id: int | None):
+    """Users with their live todo counts, in one grouped LEFT JOIN.
+
+    Count sorts are descending with the user id as tie-breaker; the keyset
+    condition on an aggregate has to go in HAVING.
+    """
+    todos = models.Todos
+    counts = {
+        # owner_id rather than id, so PostgreSQL can answer from the index alone.
+        "total": func.count(todos.owner_id),
+        "open": func.count(case((todos.complete.is_(False), 1))),
+    }
+    query = (
+        select(
+            models.Users.id,
+            models.Users.username,
+            models.Users.email,
+            models.Users.role,
+            models.Users.is_active,
+            counts["total"].label("total"),
+            counts["open"].label("open"),
+            *(func.count(case((todos.priority == priority, 1))).label(f"priority_{priority}") for priority in PRIORITIES),
+        )
+        .outerjoin(todos, and_(todos.owner_id == models.Users.id, todos.deleted_at.is_(None)))
+        .group_by(models.Users.id)
+        .limit(limit)
+    )
+    if sort == "id":
+        if after_id is not None:
+            query = query.where(models.Users.id > after_id)
+        return query.order_by(models.Users.id)
+    count = counts[sort]
+    if after_id is not None and after_value is not None:
+        query = query.having(or_(count < after_value, and_(count == after_value, models.Users.id > after_id)))
+    return query.order_by(count.desc(), models.Users.id)
+
+
+@router.get("/users", status_code=status.HTTP_200_OK)
+async def read_users(
+    user: user_dependency,
+    db: read_db_dependency,
+    sort: str = Query("id", pattern=f"^({'|'.join(USER_SORTS)})$", description="`total` and `open` sort descending"),
+    limit: int = Query(100, gt=0, le=1000),
+    after_id: int | None = Query(None, ge=0, description="`next_after_id` from the previous page"),
+    after_value: int | None = Query(None, ge=0, description="`next_after_value` from the previous page"),
+):
+    """Users with per-user todo counts, keyset-paginated."""
+    _require_admin(user)
+    rows = db.execute(user_directory_query(sort, limit, after_value, after_id)).all()
+    items = [
+        {
+            "id": row.id,
+            "username": row.username,
+            "email": row.email,
+            "role": row.role,
+            "is_active": row.is_active,
+            "todos": {
+                "total": row.total,
+                "open": row.open,
+                "by_priority": {str(priority): row._mapping[f"priority_{priority}"] for priority in PRIORITIES},
+            },
+        }
+        for row in rows
+    ]
+    last = rows[-1] if len(rows) == limit else None
+    return {
+        "items": items,
+        "next_after_id": last.id if last else None,
+        "next_after_value": getattr(last, sort) if last and sort != "id" else None,
+    }
+
 
 @router.delete("/todo/{todo_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_todo(
     user: user_dependency,
     db: db_dependency,
+    request: Request,
     todo_id: int = Path(gt=0, description="The ID of the todo item to delete")
 ):
     if user is None or user.get("role", "").lower() != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
     
-    todo_model = db.query(models.Todos).filter(models.Todos.id == todo_id).first()
-    if not todo_model:
-        raise HTTPException(status_code=404, detail="Todo not found")
-    
-    db.delete(todo_model)
+    todo_model = db.scalars(statements.live_todo_by_id, {"id": todo_id}).first()
+    if todo_model:
+        todo_model.deleted_at = datetime.now(timezone.utc)
+    else:
+        # Archived todos are deleted outright, as in DELETE /todos/{todo_id}.
+        todo_model = db.scalars(statements.archived_todo_by_id, {"id": todo_id}).first()
+        if not todo_model:
+            raise HTTPException(status_code=404, detail="Todo not found")
+        db.delete(todo_model)
     db.commit()
+    notify_write(todo_model.owner_id, "deleted", {"id": todo_id})
+    audit.audit_log.record("admin.delete_todo", actor_id=user.get("id"), target=f"todo:{todo_id}",
+                           detail={"owner_id": todo_model.owner_id}, ip_address=audit.client_ip(request))
+
+
+@router.get("/metrics/coalescing", status_code=status.HTTP_200_OK)
+async def coalescing_metrics(user: user_dependency):
+    _require_admin(user)
+    return coalescer.stats()
+
+
+@router.get("/metrics/admission", status_code=status.HTTP_200_OK)
+async def admission_metrics(user: user_dependency):
+    """Current concurrency limit, baseline latency and rejections per route (this worker)."""
+    _require_admin(user)
+    return admission.controller.stats()
+
+
+@router.get("/metrics/audit", status_code=status.HTTP_200_OK)
+async def audit_metrics(user: user_dependency):
+    _require_admin(user)
+    return audit.audit_log.stats()
+
+
+class ProfilingSettingsRequest(BaseModel):
+    sample_rate: float = Field(ge=0, le=1, description="Fraction of requests to profile (this worker only)")
+
+
+@router.get("/profiles", status_code=status.HTTP_200_OK)
+async def read_profiles(user: user_dependency):
+    """Recent profiles, newest first."""
+    _require_admin(user)
+    return {
+        "settings": profiling.profiler.settings(),
+        "items": [profile.summary() for profile in reversed(profiling.profiler.profiles)],
+    }
+
+
+@router.put("/profiles/settings", status_code=status.HTTP_200_OK)
+async def update_profiling_settings(user: user_dependency, settings: ProfilingSettingsRequest):
+    _require_admin(user)
+    profiling.profiler.sample_rate = settings.sample_rate
+    return profiling.profiler.settings()
+
+
+@router.get("/profiles/{profile_id}", status_code=status.HTTP_200_OK)
+async def read_profile(
+    user: user_dependency,
+    profile_id: int = Path(gt=0),
+    format: str = Query("json", pattern="^(json|collapsed)$", description="`collapsed` returns flamegraph.pl input"),
+):
+    _require_admin(user)
+    profile = profiling.profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.to_dict()
+
+
+@router.get("/audit", status_code=status.HTTP_200_OK)
+async def read_audit_events(
+    user: user_dependency,
+    db: read_db_dependency,
+    before_id: int | None = Query(None, gt=0, description="Return events older than this id"),
+    limit: int = Query(100, gt=0, le=1000),
+    action: str | None = Query(None, description='e.g. "auth.login_failed"'),
+    actor_id: int | None = Query(None, gt=0),
+):
+    """Audit events, newest first; pass `next_before_id` back to get the next page."""
+    _require_admin(user)
+    events = audit.query_events(db, before_id, limit, action, actor_id)
+    return {
+        "items": events,
+        "next_before_id": events[-1].id if len(events) == limit else None,
+    }
+
+
+@router.get("/purge", status_code=status.HTTP_200_OK)
+async def purge_status(user: user_dependency, db: read_db_dependency):
+    _require_admin(user)
+    now = datetime.now(timezone.utc)
+    return {
+        "backlog": purge.backlog(db),
+        "eligible": purge.backlog(db, now - purge.PURGE_RETENTION),
+        "window_utc": {"start_hour": purge.PURGE_WINDOW[0], "end_hour": purge.PURGE_WINDOW[1]},
+        "in_window": purge.in_window(now),
+        # The run stats below are this worker's; only the job runner has any.
+        "job_runner": background.runner.elected,
+        **purge.stats.to_dict(),
+    }
+
+
+@router.get("/archive", status_code=status.HTTP_200_OK)
+async def archive_status(user: user_dependency, db: read_db_dependency):
+    _require_admin(user)
+    return {
+        "rows": archive.table_sizes(db),
+        "archive_after_days": archive.ARCHIVE_AFTER.days,
+        "job_runner": background.runner.elected,
+        **archive.stats.to_dict(),
+    }
+
+
+format_query = Query(default=None, pattern="^(csv|ndjson)$", description="Input format; defaults to the file extension")
+
+
+@router.post("/import/users", status_code=status.HTTP_200_OK)
+async def import_users(user: user_dependency, db: db_dependency, file: UploadFile, format: str | None = format_query):
+    _require_admin(user)
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    report = await run_in_threadpool(
+        bulk_import.import_users, db, lines, format or bulk_import.detect_format(file.filename)
+    )
+    return report.to_dict()
+
 
+@router.post("/import/todos", status_code=status.HTTP_200_OK)
+async def import_todos(user: user_dependency, db: db_dependency, file: UploadFile, format: str | None = format_query):
+    _require_admin(user)
+    lines = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    report = await run_in_threadpool(
+        bulk_import.import_todos, db, lines, format or bulk_import.detect_format(file.filename)
+    )
+    return report.to_dict()
@@ -1,12 +1,13 @@
 from datetime import datetime, timedelta, timezone
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from .. import models
+from .. import models, audit, idempotency, statements
 from passlib.context import CryptContext
-from ..database import SessionLocal  # Adjust the import path as needed
+from ..database import SessionLocal, session_router  # Adjust the import path as needed
 from sqlalchemy.orm import Session
 from fastapi import Depends
-from typing import Annotated
+from typing import Annotated, Callable
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from jose import jwt
 
@@ -65,7 +66,7 @@ def get_db():
 db_dependency = Annotated[Session, Depends(get_db)]
 
 def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(models.Users).filter(models.Users.username == username).first()
+    user = db.scalars(statements.user_by_username, {"username": username}).first()
     if not user:
         return False
     if not bcrypt_context.verify(password, user.hashed_password):
@@ -83,10 +84,24 @@ def create_access_token(username: str, user_id:int, role: str, expires_delta: ti
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
 @router.post("/", status_code=201, response_model=UserResponse)
-async def create_user(db: db_dependency, create_user_request: CreateUserRequest):
+async def create_user(db: db_dependency, create_user_request: CreateUserRequest,
+                      idempotency_key: str | None = idempotency.idempotency_header):
+    if idempotency_key:
+        # Checked before hashing so a retry never pays for bcrypt again.
+        key = idempotency.scoped_key("auth.create_user", create_user_request.username, idempotency_key)
+        # A retry with a different password is a different request; the
+        # password itself never reaches the idempotency table.
+        request_hash = idempotency.fingerprint({
+            **create_user_request.model_dump(exclude={"password"}),
+            "password": idempotency.secret_digest(SECRET_KEY, create_user_request.password),
+        })
+        stored = idempotency.store.lookup(db, key, request_hash)
+        if stored:
+            return stored.replay()
     create_user_model = models.Users (
         username=create_user_request.username,
-        hashed_password= bcrypt_context.hash(create_user_request.password),
+        # bcrypt takes ~0.25 s of CPU; keep it off the event loop.
+        hashed_password=await run_in_threadpool(bcrypt_context.hash, create_user_request.password),
         email=create_user_request.email,
         first_name=create_user_request.first_name,
         last_name=create_user_request.last_name,
@@ -94,12 +109,7 @@ async def create_user(db: db_dependency, create_user_request: CreateUserRequest)
         is_active=True  
     )
 
-    db.add(create_user_model)
-    db.commit()
-    db.refresh(create_user_model)
-
-   
-    return UserResponse(
+    user_response = UserResponse(
         username=create_user_model.username,
         email=create_user_model.email,
         first_name=create_user_model.first_name,
@@ -107,6 +117,17 @@ async def create_user(db: db_dependency, create_user_request: CreateUserRequest)
         role=create_user_model.role
     )
 
+    db.add(create_user_model)
+    if idempotency_key:
+        stored = idempotency.store.commit(db, key, request_hash, 201, user_response.model_dump())
+        if stored:
+            return stored.replay()
+    else:
+        db.commit()
+        db.refresh(create_user_model)
+
+    return user_response
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: db_dependency):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -126,13 +147,34 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: db
         raise HTTPException(
             status_code=401, detail="Invalid authentication credentials"
         )
-    
+
+
+def get_read_db(user: Annotated[dict, Depends(get_current_user)]):
+    """Session for routes that only read; may be served by a replica."""
+    db = session_router.session(read_only=True, user_id=user.get("id") if user else None)
+    try:
+        yield db
+    finally:
+        db.close()
+
+read_db_dependency = Annotated[Session, Depends(get_read_db)]
+
+
+def get_read_session_factory(user: Annotated[dict, Depends(get_current_user)]):
+    """Opens read sessions like `get_read_db`, for work that may outlive the request."""
+    user_id = user.get("id") if user else None
+    return lambda: session_router.session(read_only=True, user_id=user_id)
+
+read_session_factory_dependency = Annotated[Callable[[], Session], Depends(get_read_session_factory)]
+
 
 @router.post("/token", response_model=Token, status_code=200)
 async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-                                 db: db_dependency):
-    user = authenticate_user(db, form_data.username, form_data.password)
+                                 db: db_dependency, request: Request):
+    user = await run_in_threadpool(authenticate_user, db, form_data.username, form_data.password)
     if not user:
+        audit.audit_log.record("auth.login_failed", detail={"username": form_data.username},
+                               ip_address=audit.client_ip(request))
         raise HTTPException(
             status_code=401,
             detail="Invalid credentials"
@@ -143,4 +185,6 @@ async def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm,
         role=user.role,
         expires_delta=timedelta(minutes=30)  # Token valid for 30 minutes
     )
+    audit.audit_log.record("auth.login", actor_id=user.id, target=f"user:{user.id}",
+                           ip_address=audit.client_ip(request))
     return {"access_token": token, "token_type": "bearer"}
\ No newline at end of file
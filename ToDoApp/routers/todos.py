@@ -1,10 +1,16 @@
-from fastapi import APIRouter,Depends, HTTPException, status, Path
+from datetime import datetime, timezone
+from fastapi import APIRouter,Depends, HTTPException, status, Path, Query, Request, Response, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from typing import Annotated
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
-from .. import models
-from ..database import SessionLocal
-from .auth import get_current_user
+from .. import models, idempotency, ordering, statements
+from ..coalesce import coalescer, render_json, with_session
+from ..events import HEARTBEAT_SECONDS, format_sse, hub
+from ..database import SessionLocal, session_router
+from .auth import get_current_user, read_db_dependency, read_session_factory_dependency
 
 
 router = APIRouter(
@@ -29,56 +35,382 @@ class TodoRequest(BaseModel):
     priority: int = Field(gt=0, le=6,description="The priority of the todo item (1-6)")
     complete: bool = False
 
-@router.get("/", status_code=status.HTTP_200_OK)
-async def read_all(user: user_dependency, db: db_dependency):
-    todos = db.query(models.Todos).filter(models.Todos.owner_id == user.get("id")).all()
+class TodoUpdateRequest(TodoRequest):
+    version: int | None = Field(default=None, gt=0, description="Version the client last saw; the update fails with 412 if the todo changed since")
+
+class TodoPatchRequest(BaseModel):
+    # Omitted fields are left alone; the `None` defaults are never validated, so an explicit null is rejected.
+    title: str = Field(default=None, min_length=3, max_length=100, description="The title of the todo item")
+    description: str = Field(default=None, min_length=3, max_length=500, description="The description of the todo item")
+    priority: int = Field(default=None, gt=0, le=6, description="The priority of the todo item (1-6)")
+    complete: bool = None
+    version: int | None = Field(default=None, gt=0, description="Version the client last saw; the update fails with 412 if the todo changed since")
+
+class TodoMoveRequest(BaseModel):
+    after_id: int | None = Field(default=None, gt=0, description="Place the todo right after this one; omit to move it to the top")
+
+class TodoBulkStatusRequest(BaseModel):
+    complete: bool = Field(description="Status to set")
+    ids: list[int] | None = Field(default=None, min_length=1, max_length=1000, description="Todos to change; all of the user's todos if omitted")
+    priority: int | None = Field(default=None, gt=0, le=6, description="Only change todos with this priority")
+
+
+TODO_FIELDS = tuple(models.Todos.__table__.columns.keys())
+fields_query = Query(
+    default=None,
+    description="Comma-separated list of fields to return, e.g. `id,title,complete`",
+)
+
+
+def parse_fields(fields: str | None):
+    """Validate a `?fields=` sparse fieldset against the todo columns."""
+    if fields is None:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in TODO_FIELDS]
+    if not requested or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown) or fields}")
+    return requested
+
+
+def live_todos(db: Session):
+    """Todos that have not been soft-deleted."""
+    return db.query(models.Todos).filter(models.Todos.deleted_at.is_(None))
+
+
+def get_owned_todo(db: Session, owner_id: int, todo_id: int):
+    """The live todo `todo_id` if `owner_id` owns it, else None."""
+    return db.scalars(statements.owned_live_todo, {"id": todo_id, "owner_id": owner_id}).first()
+
+
+def parse_if_match(if_match: str | None):
+    """Return the version in an `If-Match: "3"` header, or None for `*`/absent."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    tag = if_match.strip().removeprefix("W/").strip('"')
+    if not tag.isdigit():
+        raise HTTPException(status_code=400, detail="If-Match must be a todo version ETag")
+    return int(tag)
+
+
+def set_etag(response: Response, todo_model):
+    if todo_model.version is not None:
+        response.headers["ETag"] = f'"{todo_model.version}"'
+
+
+def select_fields(todo_model, fields):
+    return {field: getattr(todo_model, field) for field in fields}
+
+
+ADMIN_SCOPE = "admin"
+# Archived todos returned by `GET /todos/?include_archived=true`.
+INCLUDED_ARCHIVE_LIMIT = 100
+
+
+def notify_write(owner_id, event_type: str, data):
+    """Bookkeeping after a committed change to `owner_id`'s todos."""
+    session_router.record_write(owner_id)
+    coalescer.invalidate(owner_id)
+    coalescer.invalidate(ADMIN_SCOPE)
+    hub.publish(owner_id, event_type, data)
+
+
+def _list_todos_json(db: Session, owner_id: int, selected, include_archived: bool = False):
+    """The serialized list and, if more archived todos remain, the `after_id` to page on from."""
+    todos = db.scalars(statements.owner_live_todos, {"owner_id": owner_id}).all()
+    next_archived_after_id = None
+    if include_archived:
+        archived = (
+            db.query(models.TodosArchive)
+            .filter(models.TodosArchive.owner_id == owner_id)
+            .order_by(models.TodosArchive.id)
+            .limit(INCLUDED_ARCHIVE_LIMIT + 1)
+            .all()
+        )
+        if len(archived) > INCLUDED_ARCHIVE_LIMIT:
+            archived = archived[:INCLUDED_ARCHIVE_LIMIT]
+            next_archived_after_id = archived[-1].id
+        todos += archived
     if not todos:
-        return {"message": "No todos found."}
-    return todos
+        return render_json({"message": "No todos found."}), None
+    # Archived rows carry extra bookkeeping columns; keep the shape uniform.
+    body = render_json(jsonable_encoder([select_fields(todo, selected or TODO_FIELDS) for todo in todos]))
+    return body, next_archived_after_id
+
+
+@router.get("/", status_code=status.HTTP_200_OK)
+async def read_all(user: user_dependency, session_factory: read_session_factory_dependency,
+                   fields: str | None = fields_query,
+                   include_archived: bool = Query(False, description="Also return the first archived todos")):
+    selected = parse_fields(fields)
+    # Identical concurrent list reads share one query and one serialized body.
+    body, next_archived_after_id = await coalescer.do(
+        ("todos", user.get("id"), tuple(selected or ()), include_archived),
+        with_session(session_factory, _list_todos_json), user.get("id"), selected, include_archived,
+    )
+    response = Response(content=body, media_type="application/json")
+    if next_archived_after_id is not None:
+        # The rest is paged through GET /todos/archive?after_id=...
+        response.headers["X-Archive-Next-After-Id"] = str(next_archived_after_id)
+    return response
+
+
+@router.get("/archive", status_code=status.HTTP_200_OK)
+async def read_archive(
+    user: user_dependency,
+    db: read_db_dependency,
+    after_id: int = Query(0, ge=0, description="Return archived todos with an id greater than this"),
+    limit: int = Query(100, gt=0, le=1000),
+    fields: str | None = fields_query,
+):
+    """Page through the current user's archived todos in id order."""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    selected = parse_fields(fields) or TODO_FIELDS
+    todos = (
+        db.query(models.TodosArchive)
+        .filter(models.TodosArchive.owner_id == user.get("id"), models.TodosArchive.id > after_id)
+        .order_by(models.TodosArchive.id)
+        .limit(limit)
+        .all()
+    )
+    return {
+        "items": [select_fields(todo, selected) for todo in todos],
+        "next_after_id": todos[-1].id if len(todos) == limit else None,
+    }
+
+
+@router.get("/stream", status_code=status.HTTP_200_OK)
+async def stream_changes(user: user_dependency, request: Request):
+    """Server-Sent Events feed of the current user's todo changes."""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    subscription = hub.subscribe(user.get("id"))
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                yield format_sse(event) if event else ": keep-alive\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{todo_id}", status_code=status.HTTP_200_OK)
-async def read_todo(user: user_dependency, db: db_dependency, todo_id: int = Path(gt=0, description="The ID of the todo item to retrieve")):
+async def read_todo(user: user_dependency, db: read_db_dependency, response: Response, todo_id: int = Path(gt=0, description="The ID of the todo item to retrieve"), fields: str | None = fields_query):
     if user is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    todo_model = db.query(models.Todos).filter(models.Todos.id == todo_id, models.Todos.owner_id == user.get("id")).first()
+    selected = parse_fields(fields)
+    todo_model = get_owned_todo(db, user.get("id"), todo_id)
     if todo_model:
+        set_etag(response, todo_model)
+        if selected:
+            return select_fields(todo_model, selected)
         return todo_model
     raise HTTPException(status_code=404, detail="Todo not found")
 
 @router.post("/", status_code=status.HTTP_201_CREATED) # Changed path from /todo to /
-async def create_todo(user: user_dependency, todo: TodoRequest, db: db_dependency):
+async def create_todo(user: user_dependency, todo: TodoRequest, db: db_dependency,
+                      idempotency_key: str | None = idempotency.idempotency_header):
     if user is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    todo_model = models.Todos(**todo.model_dump(), owner_id=user.get("id")) # Changed todo.dict() to todo.model_dump() for Pydantic v2
+    if idempotency_key:
+        key = idempotency.scoped_key("todos.create", user.get("id"), idempotency_key)
+        request_hash = idempotency.fingerprint(todo.model_dump())
+        stored = idempotency.store.lookup(db, key, request_hash)
+        if stored:
+            return stored.replay()
+    position = ordering.generate_key_between(ordering.last_position(db, user.get("id"), lock=True), None)
+    todo_model = models.Todos(**todo.model_dump(), owner_id=user.get("id"), position=position) # Changed todo.dict() to todo.model_dump() for Pydantic v2
     db.add(todo_model)
-    db.commit()
+    if idempotency_key:
+        db.flush()  # Assigns the id that goes into the stored response
+        content = jsonable_encoder(select_fields(todo_model, TODO_FIELDS))
+        stored = idempotency.store.commit(db, key, request_hash, status.HTTP_201_CREATED, content)
+        if stored:
+            return stored.replay()
+    else:
+        db.commit()
     # Return the created todo item, as per common REST API practice and test expectations
     # The test expects a 201 response with the created item.
     # Refresh to get DB-assigned values like ID.
     db.refresh(todo_model)
+    notify_write(user.get("id"), "created", todo_model)
     return todo_model
 
 
 @router.put("/{todo_id}", status_code=status.HTTP_200_OK) # Changed /todo/{todo_id} to /{todo_id} and 204 to 200 to return content
 async def update_todo(
     user: user_dependency,
-    todo_request: TodoRequest,
+    todo_request: TodoUpdateRequest,
+    db: db_dependency,
+    response: Response,
+    todo_id: int = Path(gt=0, description="The ID of the todo item to update"),
+    if_match: str | None = Header(default=None, description='Current ETag of the todo, e.g. "3"'),
+    idempotency_key: str | None = idempotency.idempotency_header,
+):
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    if idempotency_key:
+        key = idempotency.scoped_key(f"todos.update.{todo_id}", user.get("id"), idempotency_key)
+        request_hash = idempotency.fingerprint([todo_request.model_dump(), if_match])
+        stored = idempotency.store.lookup(db, key, request_hash)
+        if stored:
+            return stored.replay()
+    expected_version = parse_if_match(if_match)
+    if expected_version is None:
+        expected_version = todo_request.version
+    # Without a version the update is unconditional, but the bump still
+    # happens in SQL so concurrent writers never share a version.
+    todo_model = update_returning(db, user.get("id"), todo_id, todo_request.model_dump(exclude={"version"}), expected_version)
+    if idempotency_key:
+        # The update is already committed; the stored response only has to
+        # outlive it, so a lost race here is harmless.
+        idempotency.store.commit(db, key, request_hash, status.HTTP_200_OK, jsonable_encoder(todo_model))
+    set_etag(response, todo_model)
+    notify_write(user.get("id"), "updated", todo_model)
+    return todo_model
+
+
+@router.patch("/{todo_id}", status_code=status.HTTP_200_OK)
+async def patch_todo(
+    user: user_dependency,
+    todo_request: TodoPatchRequest,
     db: db_dependency,
-    todo_id: int = Path(gt=0, description="The ID of the todo item to update")
+    response: Response,
+    todo_id: int = Path(gt=0, description="The ID of the todo item to update"),
+    if_match: str | None = Header(default=None, description='Current ETag of the todo, e.g. "3"'),
 ):
+    """Update only the fields present in the body."""
     if user is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
-    todo_model = db.query(models.Todos).filter(models.Todos.id == todo_id, models.Todos.owner_id == user.get("id")).first()
-    if todo_model is None:
+    values = todo_request.model_dump(exclude_unset=True, exclude={"version"})
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    expected_version = parse_if_match(if_match)
+    if expected_version is None:
+        expected_version = todo_request.version
+    todo_model = update_returning(db, user.get("id"), todo_id, values, expected_version)
+    set_etag(response, todo_model)
+    notify_write(user.get("id"), "updated", todo_model)
+    return todo_model
+
+
+@router.post("/{todo_id}/move", status_code=status.HTTP_200_OK)
+async def move_todo(
+    user: user_dependency,
+    move: TodoMoveRequest,
+    db: db_dependency,
+    todo_id: int = Path(gt=0, description="The ID of the todo item to move"),
+):
+    """Give the todo a position between its new neighbours; no other row is written."""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    owner_id = user.get("id")
+    if move.after_id == todo_id:
+        raise HTTPException(status_code=400, detail="A todo cannot be moved after itself")
+    if get_owned_todo(db, owner_id, todo_id) is None:
         raise HTTPException(status_code=404, detail="Todo not found")
-    todo_model.title = todo_request.title
-    todo_model.description = todo_request.description
-    todo_model.priority = todo_request.priority
-    todo_model.complete = todo_request.complete
+    lower = None
+    if move.after_id is not None:
+        after = get_owned_todo(db, owner_id, move.after_id)
+        if after is None:
+            raise HTTPException(status_code=404, detail="Todo to move after not found")
+        if after.position is None:
+            # Inserted without a position (e.g. straight into the table): number the list first.
+            ordering.rebalance_owner(db, owner_id)
+            db.refresh(after)
+        lower = after.position
+    upper = db.scalar(
+        select(func.min(models.Todos.position)).where(
+            models.Todos.owner_id == owner_id,
+            models.Todos.id != todo_id,
+            models.Todos.deleted_at.is_(None),
+            *([models.Todos.position > lower] if lower is not None else []),
+        )
+    )
+    position = ordering.generate_key_between(lower, upper)
+    db.execute(
+        update(models.Todos)
+        .where(models.Todos.id == todo_id, models.Todos.owner_id == owner_id)
+        .values(position=position),
+        execution_options={"synchronize_session": False},
+    )
     db.commit()
-    db.refresh(todo_model)
-    return todo_model
+    notify_write(owner_id, "updated", {"id": todo_id, "position": position})
+    return {"id": todo_id, "position": position}
+
+
+@router.post("/bulk-status", status_code=status.HTTP_200_OK)
+async def update_status_bulk(user: user_dependency, request: TodoBulkStatusRequest, db: db_dependency):
+    """Set `complete` on the listed (or all matching) todos in one statement."""
+    if user is None:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    query = update(models.Todos).where(
+        models.Todos.owner_id == user.get("id"),
+        models.Todos.deleted_at.is_(None),
+        # Rows already in the requested state are neither written nor re-versioned.
+        models.Todos.complete.is_distinct_from(request.complete),
+    )
+    if request.ids is not None:
+        query = query.where(models.Todos.id.in_(request.ids))
+    if request.priority is not None:
+        query = query.where(models.Todos.priority == request.priority)
+    updated = db.execute(
+        query.values(complete=request.complete, version=models.Todos.version + 1)
+        .returning(models.Todos.id, models.Todos.version),
+        execution_options={"synchronize_session": False},
+    ).all()
+    db.commit()
+    updated.sort()
+    if updated:
+        # One event (and one round of invalidation) for the whole batch, so a
+        # large update doesn't overflow subscriber queues into a resync.
+        notify_write(user.get("id"), "bulk_updated", {
+            "complete": request.complete,
+            "todos": [{"id": todo_id, "version": version} for todo_id, version in updated],
+        })
+    return {"updated": [todo_id for todo_id, _ in updated]}
+
+
+def update_returning(db: Session, owner_id: int, todo_id: int, values: dict, expected_version: int | None = None):
+    """Apply `values` and bump the version in one `UPDATE ... RETURNING`.
+
+    With `expected_version` the update only matches that version; no row lock
+    is taken up front.
+    """
+    query = update(models.Todos).where(
+        models.Todos.id == todo_id,
+        models.Todos.owner_id == owner_id,
+        models.Todos.deleted_at.is_(None),
+    )
+    if expected_version is not None:
+        query = query.where(models.Todos.version == expected_version)
+    todo_model = db.scalars(
+        query.values(**values, version=models.Todos.version + 1).returning(models.Todos),
+        # Overwrite a copy already in the session with the row as updated.
+        execution_options={"synchronize_session": False, "populate_existing": True},
+    ).first()
+    if todo_model is not None:
+        # Detach so the commit doesn't expire it and force a reload.
+        db.expunge(todo_model)
+        db.commit()
+        return todo_model
+    db.rollback()
+    current = get_owned_todo(db, owner_id, todo_id)
+    if current is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Todo was modified by another request",
+        headers={"ETag": f'"{current.version}"'},
+    )
 
 @router.delete("/{todo_id}", status_code=status.HTTP_204_NO_CONTENT) # Changed /todo/{todo_id} to /{todo_id}
 async def delete_todo(
@@ -86,8 +418,15 @@ async def delete_todo(
     db: db_dependency,
     todo_id: int = Path(gt=0, description="The ID of the todo item to delete")
 ):
-    todo_model = db.query(models.Todos).filter(models.Todos.id == todo_id, models.Todos.owner_id == user.get("id")).first()
-    if todo_model is None:
-        raise HTTPException(status_code=404, detail="Todo not found")
-    db.delete(todo_model)
-    db.commit()
\ No newline at end of file
+    todo_model = get_owned_todo(db, user.get("id"), todo_id)
+    if todo_model is not None:
+        todo_model.deleted_at = datetime.now(timezone.utc)
+    else:
+        # Archived todos are still listed, so they can still be deleted;
+        # nothing reads tombstones in the archive, so the row just goes.
+        archived_model = db.scalars(statements.owned_archived_todo, {"id": todo_id, "owner_id": user.get("id")}).first()
+        if archived_model is None:
+            raise HTTPException(status_code=404, detail="Todo not found")
+        db.delete(archived_model)
+    db.commit()
+    notify_write(user.get("id"), "deleted", {"id": todo_id})
\ No newline at end of file
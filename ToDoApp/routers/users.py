@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from typing import Annotated
 from passlib.context import CryptContext
 
-from .. import models
-from ..database import SessionLocal
-from .auth import get_current_user, db_dependency
+from .. import audit, statements
+from ..database import SessionLocal, session_router
+from .auth import get_current_user, db_dependency, read_db_dependency
 
 router = APIRouter(
     prefix="/users",
@@ -23,8 +24,8 @@ class UpdatePhoneRequest(BaseModel):
     phone_number: str = Field(min_length=10, max_length=15, description="The new phone number")
 
 @router.get("/me", status_code=status.HTTP_200_OK)
-async def get_user(user: Annotated[dict, Depends(get_current_user)], db: db_dependency):
-    user_model = db.query(models.Users).filter(models.Users.id == user["id"]).first()
+async def get_user(user: Annotated[dict, Depends(get_current_user)], db: read_db_dependency):
+    user_model = db.scalars(statements.user_by_id, {"id": user["id"]}).first()
     if not user_model:
         raise HTTPException(status_code=404, detail="User not found")
     return {
@@ -42,27 +43,37 @@ async def get_user(user: Annotated[dict, Depends(get_current_user)], db: db_depe
 async def change_password(
     user: Annotated[dict, Depends(get_current_user)],
     db: db_dependency,
-    passwords: ChangePasswordRequest
+    passwords: ChangePasswordRequest,
+    request: Request,
 ):
-    user_model = db.query(models.Users).filter(models.Users.id == user["id"]).first()
+    user_model = db.scalars(statements.user_by_id, {"id": user["id"]}).first()
     if not user_model:
         raise HTTPException(status_code=404, detail="User not found")
-    if not bcrypt_context.verify(passwords.old_password, user_model.hashed_password):
+    if not await run_in_threadpool(bcrypt_context.verify, passwords.old_password, user_model.hashed_password):
+        audit.audit_log.record("users.change_password_failed", actor_id=user["id"], target=f"user:{user['id']}",
+                               ip_address=audit.client_ip(request))
         raise HTTPException(status_code=400, detail="Old password is incorrect")
-    user_model.hashed_password = bcrypt_context.hash(passwords.new_password)
+    user_model.hashed_password = await run_in_threadpool(bcrypt_context.hash, passwords.new_password)
     db.commit()
+    session_router.record_write(user["id"])
+    audit.audit_log.record("users.change_password", actor_id=user["id"], target=f"user:{user['id']}",
+                           ip_address=audit.client_ip(request))
     return {"message": "Password changed successfully"}
 
 @router.put("/phone", status_code=status.HTTP_200_OK)
 async def update_phone_number(
     user: Annotated[dict, Depends(get_current_user)],
     db: db_dependency,
-    phone_request: UpdatePhoneRequest
+    phone_request: UpdatePhoneRequest,
+    request: Request,
 ):
-    user_model = db.query(models.Users).filter(models.Users.id == user["id"]).first()
+    user_model = db.scalars(statements.user_by_id, {"id": user["id"]}).first()
     if not user_model:
         raise HTTPException(status_code=404, detail="User not found")
     
     user_model.phone_number = phone_request.phone_number
     db.commit()
+    session_router.record_write(user["id"])
+    audit.audit_log.record("users.update_phone_number", actor_id=user["id"], target=f"user:{user['id']}",
+                           ip_address=audit.client_ip(request))
     return {"message": "Phone number updated successfully"}
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""Production entry point: run the API across several worker processes.
+
+Usage:
+    python -m ToDoApp.serve --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import importlib.util
+import os
+
+import uvicorn
+
+APP = "ToDoApp.main:app"
+GRACEFUL_SHUTDOWN_SECONDS = 30
+
+
+def default_workers():
+    """One worker per CPU available to this process."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return os.cpu_count() or 1
+
+
+def fast_paths():
+    """Use uvloop and httptools when installed, the pure-Python defaults otherwise."""
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    return loop, http
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ToDoApp API.")
+    parser.add_argument("--host", default=os.environ.get("TODOAPP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("TODOAPP_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("TODOAPP_WORKERS", "0")),
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_SHUTDOWN_SECONDS,
+                        help="Seconds to drain in-flight requests on shutdown")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true")
+    args = parser.parse_args(argv)
+
+    loop, http = fast_paths()
+    # Each worker is a freshly spawned interpreter that imports ToDoApp.main
+    # itself, so it builds its own engine and connection pool.
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers or default_workers(),
+        loop=loop,
+        http=http,
+        backlog=args.backlog,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+        access_log=not args.no_access_log,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
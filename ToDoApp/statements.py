@@ -0,0 +1,48 @@
+"""Pre-built statements for the lookups every request makes.
+
+Building a `Query` per request costs Python time before SQLAlchemy even
+looks at its compiled cache: the query object, the filter expressions and
+their cache key are all created afresh. These statements are built once at
+import; their cache key is memoized on the statement, so executing one is a
+cache hit straight away, and the SQL text is identical on every call, which
+lets psycopg 3 prepare it on the server (see `database.PREPARE_THRESHOLD`).
+
+Execute them with the values as parameters, e.g.
+`db.scalars(statements.user_by_username, {"username": name}).first()`.
+"""
+from sqlalchemy import bindparam, select
+
+from . import models
+
+user_by_username = select(models.Users).where(models.Users.username == bindparam("username"))
+
+user_by_id = select(models.Users).where(models.Users.id == bindparam("id"))
+
+# Live (not soft-deleted) todo by id, for admins.
+live_todo_by_id = select(models.Todos).where(
+    models.Todos.id == bindparam("id"),
+    models.Todos.deleted_at.is_(None),
+)
+
+# Live todo by id, only if `owner_id` owns it.
+owned_live_todo = select(models.Todos).where(
+    models.Todos.id == bindparam("id"),
+    models.Todos.owner_id == bindparam("owner_id"),
+    models.Todos.deleted_at.is_(None),
+)
+
+# Archived todo by id, for admins.
+archived_todo_by_id = select(models.TodosArchive).where(models.TodosArchive.id == bindparam("id"))
+
+# Archived todo by id, only if `owner_id` owns it.
+owned_archived_todo = select(models.TodosArchive).where(
+    models.TodosArchive.id == bindparam("id"),
+    models.TodosArchive.owner_id == bindparam("owner_id"),
+)
+
+# An owner's live todos in list order.
+owner_live_todos = (
+    select(models.Todos)
+    .where(models.Todos.owner_id == bindparam("owner_id"), models.Todos.deleted_at.is_(None))
+    .order_by(models.Todos.position.asc().nulls_last(), models.Todos.id)
+)
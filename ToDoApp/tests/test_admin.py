@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from ToDoApp import bulk_import
+from ToDoApp.main import app
+from ToDoApp.models import Todos, Users
+from ToDoApp.routers.admin import get_db
+from ToDoApp.routers.auth import get_current_user, get_read_db
+
+# user id -> (open, complete) todo counts
+TODO_COUNTS = {1: (2, 1), 2: (5, 0), 3: (0, 4), 4: (2, 0), 5: (0, 0)}
+
+
+@pytest.fixture
+def engine(engine):
+    with sessionmaker(bind=engine)() as db:
+        for user_id, (open_count, complete_count) in TODO_COUNTS.items():
+            db.add(Users(id=user_id, username=f"user{user_id}", email=f"user{user_id}@example.com",
+                         hashed_password="x", role="user", is_active=True))
+            db.add_all(
+                Todos(title="Todo", description="Desc", priority=i % 6 + 1, complete=i >= open_count,
+                      owner_id=user_id)
+                for i in range(open_count + complete_count)
+            )
+        # Soft-deleted todos are not counted.
+        db.add(Todos(title="Gone", description="Desc", priority=1, complete=False, owner_id=5,
+                     deleted_at=datetime.now(timezone.utc)))
+        db.commit()
+    return engine
+
+
+@pytest.fixture
+def client(session_factory):
+    def override_get_read_db():
+        with session_factory() as db:
+            yield db
+
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        get_read_db: override_get_read_db,
+        get_current_user: lambda: {"username": "admin", "id": 99, "role": "admin"},
+    }
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def test_users_are_listed_with_todo_counts_in_one_query(client, engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    page = client.get("/admin/users?limit=2").json()
+
+    assert len(statements) == 1
+    assert [item["id"] for item in page["items"]] == [1, 2]
+    assert page["items"][0]["todos"] == {
+        "total": 3, "open": 2, "by_priority": {"1": 1, "2": 1, "3": 1, "4": 0, "5": 0, "6": 0},
+    }
+    assert page["next_after_id"] == 2 and page["next_after_value"] is None
+
+
+def test_users_page_through_open_counts(client):
+    seen = []
+    url = "/admin/users?sort=open&limit=2"
+    while url:
+        page = client.get(url).json()
+        seen += [(item["id"], item["todos"]["open"]) for item in page["items"]]
+        url = page["next_after_id"] and (
+            f"/admin/users?sort=open&limit=2&after_id={page['next_after_id']}&after_value={page['next_after_value']}"
+        )
+    assert seen == [(2, 5), (1, 2), (4, 2), (3, 0), (5, 0)]
+
+
+def test_users_directory_is_admin_only(client):
+    app.dependency_overrides[get_current_user] = lambda: {"username": "user1", "id": 1, "role": "user"}
+    assert client.get("/admin/users").status_code == 403
+
+
+@pytest.fixture
+def import_client(session_factory):
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    original_overrides = app.dependency_overrides
+    original_pool = bulk_import._shared_pool
+    app.dependency_overrides = {
+        get_db: override_get_db,
+        get_current_user: lambda: {"username": "admin", "id": 99, "role": "admin"},
+    }
+    # Hashing in threads keeps the endpoint tests fast; the pool is only an executor.
+    bulk_import._shared_pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        yield TestClient(app)
+    finally:
+        bulk_import._shared_pool.shutdown()
+        bulk_import._shared_pool = original_pool
+        app.dependency_overrides = original_overrides
+
+
+def test_import_users_endpoint(import_client, engine):
+    data = (
+        "username,password,email,first_name,last_name,role,phone_number\n"
+        "dana,password123,dana@example.com,Dana,Stone,user,1234567890\n"
+        "e,short,e@example.com,E,F,user,1234567890\n"
+    )
+    response = import_client.post("/admin/import/users", files={"file": ("users.csv", data, "text/csv")})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["inserted"], report["failed"]) == (1, 1)
+    assert report["errors"][0]["line"] == 3
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(Users).filter(Users.username == "dana").one().hashed_password != "password123"
+
+
+def test_import_todos_endpoint(import_client, engine):
+    data = '{"owner_id": 5, "title": "Imported", "description": "From a file", "priority": 2}\n'
+    response = import_client.post("/admin/import/todos", files={"file": ("todos.ndjson", data)})
+
+    assert response.status_code == 200
+    assert response.json()["inserted"] == 1
+    with sessionmaker(bind=engine)() as db:
+        assert db.query(Todos).filter(Todos.title == "Imported").one().owner_id == 5
+
+
+def test_import_requires_admin(import_client):
+    app.dependency_overrides[get_current_user] = lambda: {"username": "user1", "id": 1, "role": "user"}
+    response = import_client.post("/admin/import/todos", files={"file": ("todos.ndjson", "")})
+    assert response.status_code == 403
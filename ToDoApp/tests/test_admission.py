@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+
+from ToDoApp import admission
+from ToDoApp.main import app as todo_app
+
+
+def make_app(controller):
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(5)
+        return {}
+
+    @app.get("/held")
+    async def held():
+        await release.wait()
+        return {}
+
+    @app.get("/blocking")
+    def blocking():
+        app.state.unblock.wait(5)
+        return {}
+
+    @app.get("/background")
+    async def with_background(background_tasks: BackgroundTasks):
+        background_tasks.add_task(app.state.ran_in_background.set)
+        return {}
+
+    app.add_middleware(admission.AdmissionMiddleware, controller=controller)
+    app.state.release = release
+    app.state.unblock = threading.Event()
+    app.state.ran_in_background = threading.Event()
+    return app
+
+
+def test_limit_grows_when_fast_and_busy():
+    limit = admission.AdaptiveLimit(initial=4)
+    for _ in range(2):
+        assert limit.try_acquire()
+    limit.release(0.01)
+    assert limit.limit == 5
+    assert limit.baseline == 0.01
+
+
+def test_limit_backs_off_on_slow_and_timed_out_requests():
+    limit = admission.AdaptiveLimit(initial=10)
+    limit.try_acquire()
+    limit.release(0.01)
+    limit.try_acquire()
+    limit.release(1.0)
+    assert limit.limit == pytest.approx(9.0)
+    limit.try_acquire()
+    limit.release(0.01, dropped=True)
+    assert limit.limit == pytest.approx(8.1)
+    assert limit.timeouts == 1
+
+
+def test_limit_never_drops_below_minimum():
+    limit = admission.AdaptiveLimit(initial=1)
+    for _ in range(20):
+        assert limit.try_acquire()
+        limit.release(0.0, dropped=True)
+    assert limit.limit == 1
+
+
+def test_over_limit_request_is_rejected_with_retry_after():
+    controller = admission.AdmissionController(enabled=True, default_deadline=5, route_deadlines={})
+    controller.limit(("GET", "/held")).limit = 1
+    app = make_app(controller)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.ensure_future(client.get("/held"))
+            while controller.limit(("GET", "/held")).inflight == 0:
+                await asyncio.sleep(0.001)
+            second = await client.get("/held")
+            app.state.release.set()
+            return await first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert second.headers["retry-after"] == str(admission.RETRY_AFTER_SECONDS)
+    assert controller.stats()["GET /held"]["rejected"] == 1
+
+
+def test_request_past_its_deadline_gets_504():
+    controller = admission.AdmissionController(enabled=True, default_deadline=0.05, route_deadlines={})
+    client = TestClient(make_app(controller))
+    response = client.get("/slow")
+    assert response.status_code == 504
+    assert controller.stats()["GET /slow"]["timeouts"] == 1
+    assert controller.stats()["GET /slow"]["inflight"] == 0
+
+
+def test_routes_without_deadline_are_not_limited():
+    controller = admission.AdmissionController(enabled=True, default_deadline=0.05,
+                                               route_deadlines={"/items/{item_id}": None})
+    client = TestClient(make_app(controller))
+    assert client.get("/items/3").json() == {"id": 3}
+    assert controller.stats() == {}
+
+
+def test_literal_route_wins_over_path_parameter():
+    controller = admission.AdmissionController(enabled=True)
+    scope = {"app": todo_app, "method": "GET", "path": "/todos/stream"}
+    assert controller.route_key(scope) == ("GET", "/todos/stream")
+    assert controller.deadline("/todos/stream") is None
+    scope["path"] = "/todos/7"
+    assert controller.route_key(scope) == ("GET", "/todos/{todo_id}")
+
+
+def test_background_tasks_run_after_the_response():
+    # The test client, like uvicorn, reports a disconnect once the body is sent.
+    controller = admission.AdmissionController(enabled=True, default_deadline=5, route_deadlines={})
+    app = make_app(controller)
+    assert TestClient(app).get("/background").status_code == 200
+    assert app.state.ran_in_background.is_set()
+    assert controller.stats()["GET /background"]["inflight"] == 0
+
+
+def test_timed_out_sync_handler_keeps_its_slot_until_it_returns():
+    controller = admission.AdmissionController(enabled=True, default_deadline=0.05, route_deadlines={})
+    controller.limit(("GET", "/blocking")).limit = 1
+    app = make_app(controller)
+    with TestClient(app) as client:
+        assert client.get("/blocking").status_code == 504
+        # The handler still holds its thread (and would hold a pooled connection).
+        assert client.get("/blocking").status_code == 503
+        app.state.unblock.set()
+        for _ in range(100):
+            if controller.stats()["GET /blocking"]["inflight"] == 0:
+                break
+            time.sleep(0.01)
+        assert client.get("/blocking").status_code == 200
+    assert controller.stats()["GET /blocking"]["timeouts"] == 1
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from ToDoApp import archive
+from ToDoApp.main import app
+from ToDoApp.models import Todos, TodosArchive
+from ToDoApp.routers import admin, todos
+from ToDoApp.routers.auth import get_current_user, get_read_db, get_read_session_factory
+
+NOW = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+OLD = NOW - timedelta(days=90)
+
+
+def add_todos(session_factory, count, complete=True, updated_at=OLD, owner_id=1):
+    with session_factory() as db:
+        db.add_all(
+            Todos(title=f"Todo {i}", description="Desc", priority=1, complete=complete,
+                  owner_id=owner_id, updated_at=updated_at)
+            for i in range(count)
+        )
+        db.commit()
+
+
+def test_run_archive_moves_old_completed_todos_in_batches(session_factory, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_BATCH_SIZE", 2)
+    add_todos(session_factory, 5)
+    add_todos(session_factory, 1, complete=False)
+    add_todos(session_factory, 1, updated_at=NOW)
+
+    batches_before = archive.stats.batches_total
+    assert archive.run_archive(session_factory, now=NOW, pause=0) == 5
+    assert archive.stats.batches_total - batches_before == 3
+
+    with session_factory() as db:
+        assert archive.table_sizes(db) == {"hot": 2, "archived": 5}
+        moved = db.query(TodosArchive).order_by(TodosArchive.id).first()
+        assert moved.id == 1 and moved.title == "Todo 0" and moved.archived_at is not None
+    assert archive.stats.last_run_rows == 5
+
+
+def test_archived_ids_are_not_reused(session_factory):
+    add_todos(session_factory, 1)
+    assert archive.run_archive(session_factory, now=NOW, pause=0) == 1
+
+    add_todos(session_factory, 1)
+    with session_factory() as db:
+        assert db.query(Todos).one().id == 2
+    assert archive.run_archive(session_factory, now=NOW, pause=0) == 1
+
+
+def test_archived_todos_are_read_through_the_archive_endpoints(session_factory, monkeypatch):
+    add_todos(session_factory, 3)
+    add_todos(session_factory, 1, complete=False)
+    add_todos(session_factory, 2, owner_id=2)
+    archive.run_archive(session_factory, now=NOW, pause=0)
+
+    def override_get_read_db():
+        with session_factory() as db:
+            yield db
+
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        get_read_db: override_get_read_db,
+        get_read_session_factory: lambda: session_factory,
+        get_current_user: lambda: {"username": "testuser", "id": 1, "user_role": "user"},
+    }
+    try:
+        client = TestClient(app)
+        hot = client.get("/todos/").json()
+        assert [todo["id"] for todo in hot] == [4]
+
+        everything = client.get("/todos/?include_archived=true").json()
+        assert sorted(todo["id"] for todo in everything) == [1, 2, 3, 4]
+
+        monkeypatch.setattr(todos, "INCLUDED_ARCHIVE_LIMIT", 2)
+        response = client.get("/todos/?include_archived=true&fields=id")
+        assert response.json() == [{"id": 4}, {"id": 1}, {"id": 2}]
+        assert response.headers["x-archive-next-after-id"] == "2"
+
+        page = client.get("/todos/archive?limit=2&fields=id,title").json()
+        assert page == {"items": [{"id": 1, "title": "Todo 0"}, {"id": 2, "title": "Todo 1"}], "next_after_id": 2}
+        page = client.get("/todos/archive?limit=2&after_id=2").json()
+        assert [todo["id"] for todo in page["items"]] == [3]
+        assert page["next_after_id"] is None
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def test_archived_todos_can_still_be_deleted(session_factory):
+    add_todos(session_factory, 2)
+    add_todos(session_factory, 1, owner_id=2)
+    archive.run_archive(session_factory, now=NOW, pause=0)
+
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        todos.get_db: override_get_db,
+        admin.get_db: override_get_db,
+        get_current_user: lambda: {"username": "testuser", "id": 1, "role": "user"},
+    }
+    try:
+        client = TestClient(app)
+        assert client.delete("/todos/1").status_code == 204
+        assert client.delete("/todos/1").status_code == 404
+        # Someone else's archived todo stays out of reach.
+        assert client.delete("/todos/3").status_code == 404
+
+        app.dependency_overrides[get_current_user] = lambda: {"username": "admin", "id": 99, "role": "admin"}
+        assert client.delete("/admin/todo/3").status_code == 204
+    finally:
+        app.dependency_overrides = original_overrides
+
+    with session_factory() as db:
+        assert [todo.id for todo in db.query(TodosArchive)] == [2]
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ToDoApp import audit
+from ToDoApp.background import PeriodicTask
+from ToDoApp.main import app
+from ToDoApp.models import AuditEvents, Users
+from ToDoApp.routers import auth
+from ToDoApp.routers.auth import bcrypt_context, get_current_user, get_read_db
+
+
+def test_flush_writes_queued_events_in_batches(session_factory):
+    log = audit.AuditLog(session_factory, max_size=10, flush_size=4)
+    for i in range(12):
+        log.record("auth.login", actor_id=i)
+
+    assert log.stats()["dropped"] == 2
+    assert log.flush() == 10
+    assert log.flushes == 3
+    with session_factory() as db:
+        assert [event.actor_id for event in audit.query_events(db, limit=3)] == [9, 8, 7]
+
+
+def test_failed_flush_keeps_events_queued(session_factory):
+    def broken_session():
+        raise RuntimeError("database is down")
+
+    log = audit.AuditLog(broken_session, max_size=10, flush_size=4)
+    log.record("auth.login_failed", detail={"username": "mallory"})
+    with pytest.raises(RuntimeError):
+        log.flush()
+
+    log.session_factory = session_factory
+    assert log.flush() == 1
+    with session_factory() as db:
+        assert db.query(AuditEvents).one().detail == {"username": "mallory"}
+
+
+def test_full_queue_wakes_the_flush_task(session_factory):
+    async def scenario():
+        log = audit.AuditLog(session_factory, flush_size=3)
+        task = PeriodicTask("audit-test", 3600, log.flush)
+        log.on_full = task.wake
+        task.start()
+        try:
+            await asyncio.sleep(0.05)
+            for i in range(3):
+                log.record("auth.login", actor_id=i)
+            for _ in range(100):
+                if log.written == 3:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await task.stop()
+        return log.written
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_logins_are_audited_and_paged_by_admins(session_factory, monkeypatch):
+    with session_factory() as db:
+        db.add(Users(username="alice", email="alice@example.com", first_name="A", last_name="L",
+                     hashed_password=bcrypt_context.hash("secret123"), role="admin", is_active=True))
+        db.commit()
+    log = audit.AuditLog(session_factory)
+    monkeypatch.setattr(audit, "audit_log", log)
+
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        auth.get_db: override_get_db,
+        get_read_db: override_get_db,
+    }
+    try:
+        client = TestClient(app)
+        assert client.post("/auth/token", data={"username": "alice", "password": "wrong"}).status_code == 401
+        assert client.post("/auth/token", data={"username": "alice", "password": "secret123"}).status_code == 200
+        assert client.post("/auth/token", data={"username": "bob", "password": "secret123"}).status_code == 401
+        log.flush()
+
+        app.dependency_overrides[get_current_user] = lambda: {"username": "alice", "id": 1, "role": "admin"}
+        page = client.get("/admin/audit?limit=2").json()
+        assert [event["action"] for event in page["items"]] == ["auth.login_failed", "auth.login"]
+        assert page["items"][1]["actor_id"] == 1
+        page = client.get(f"/admin/audit?limit=2&before_id={page['next_before_id']}").json()
+        assert [event["detail"] for event in page["items"]] == [{"username": "alice"}]
+        assert page["next_before_id"] is None
+
+        failed = client.get("/admin/audit?action=auth.login_failed").json()["items"]
+        assert {event["detail"]["username"] for event in failed} == {"alice", "bob"}
+
+        app.dependency_overrides[get_current_user] = lambda: {"username": "bob", "id": 2, "role": "user"}
+        assert client.get("/admin/audit").status_code == 403
+    finally:
+        app.dependency_overrides = original_overrides
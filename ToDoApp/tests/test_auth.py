@@ -58,6 +58,14 @@ class MockSession:
 
         return Query(self.data, model, self)
 
+    def scalars(self, statement, params=None):
+        # Pre-built statements: match the bound parameters by column name.
+        model = statement.column_descriptions[0]["entity"]
+        query = self.query(model)
+        for name, value in (params or {}).items():
+            query = query.filter(getattr(model, name) == value)
+        return query
+
     def add(self, instance):
         self.add_count += 1
         model_type = type(instance)
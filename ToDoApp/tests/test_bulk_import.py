@@ -0,0 +1,106 @@
+import io
+import json
+import sqlite3
+
+from passlib.context import CryptContext
+
+from ToDoApp import bulk_import
+from ToDoApp.models import Todos, Users
+
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def test_import_users_csv(db):
+    data = io.StringIO(
+        "username,password,email,first_name,last_name,role,phone_number\n"
+        "alice,password123,alice@example.com,Alice,Smith,user,1234567890\n"
+        "b,short,bob@example.com,Bob,Jones,user,1234567890\n"
+        "carol,password456,carol@example.com,Carol,White,admin,1234567890\n"
+    )
+    with bulk_import.new_hashing_pool(2) as pool:
+        report = bulk_import.import_users(db, data, "csv", pool)
+
+    assert report.inserted == 2
+    assert report.failed == 1
+    assert report.errors[0]["line"] == 3
+    assert "username" in report.errors[0]["error"]
+    alice = db.query(Users).filter(Users.username == "alice").first()
+    assert bcrypt_context.verify("password123", alice.hashed_password)
+    assert alice.phone_number == "1234567890"
+
+
+def test_import_todos_ndjson_reports_row_errors(db):
+    db.add(Users(id=1, username="owner", email="owner@example.com", hashed_password="x", role="user"))
+    db.commit()
+    rows = [
+        {"owner_id": 1, "title": "Todo 1", "description": "Desc 1", "priority": 1},
+        {"owner_id": 1, "title": "Todo 2", "description": "Desc 2", "priority": 9},
+        {"title": "Todo 3", "description": "Desc 3", "priority": 2},
+    ]
+    data = io.StringIO("\n".join(json.dumps(row) for row in rows) + "\nnot json\n")
+    progress = []
+    report = bulk_import.import_todos(db, data, "ndjson", chunk_size=1, progress=progress.append)
+
+    assert report.to_dict()["inserted"] == 1
+    assert [error["line"] for error in report.errors] == [2, 3, 4]
+    assert progress
+    todo = db.query(Todos).filter(Todos.owner_id == 1).first()
+    assert (todo.title, todo.position) == ("Todo 1", "a0")
+
+
+def test_import_chunk_falls_back_to_row_inserts(db):
+    db.add(Users(id=1, username="taken", email="taken@example.com", hashed_password="x", role="user"))
+    db.commit()
+    table = Users.__table__
+    chunk = [
+        (2, {"username": "fresh", "email": "fresh@example.com", "hashed_password": "x", "role": "user"}),
+        (3, {"username": "taken", "email": "other@example.com", "hashed_password": "x", "role": "user"}),
+    ]
+    report = bulk_import.ImportReport()
+    bulk_import._insert_chunk(db, table, chunk, report)
+
+    assert report.inserted == 1
+    assert report.errors[0]["line"] == 3
+    assert db.query(Users).filter(Users.username == "fresh").first() is not None
+
+
+def test_hashing_pool_is_shared_and_never_forked(monkeypatch):
+    monkeypatch.setattr(bulk_import, "_shared_pool", None)
+    pool = bulk_import.hashing_pool()
+    try:
+        assert bulk_import.hashing_pool() is pool
+        assert pool._mp_context.get_start_method() in ("forkserver", "spawn")
+        assert bcrypt_context.verify("password123", pool.submit(bulk_import._hash_password, "password123").result())
+    finally:
+        bulk_import.shutdown_hashing_pool()
+    assert bulk_import._shared_pool is None
+
+
+def test_failed_copy_falls_back_to_row_inserts(db, monkeypatch):
+    db.add(Users(id=1, username="taken", email="taken@example.com", hashed_password="x", role="user"))
+    db.commit()
+    cursors = []
+
+    class CopyCursor:
+        closed = False
+
+        def copy_expert(self, statement, buffer):
+            raise sqlite3.IntegrityError("duplicate key value violates unique constraint")
+
+        def close(self):
+            self.closed = True
+
+    connection = db.connection().connection
+    monkeypatch.setattr(db.get_bind().dialect, "name", "postgresql")
+    monkeypatch.setattr(connection, "cursor", lambda: cursors.append(CopyCursor()) or cursors[-1])
+    chunk = [
+        (2, {"username": "fresh", "email": "fresh@example.com", "hashed_password": "x", "role": "user"}),
+        (3, {"username": "taken", "email": "other@example.com", "hashed_password": "x", "role": "user"}),
+    ]
+    report = bulk_import.ImportReport()
+    bulk_import._insert_chunk(db, Users.__table__, chunk, report)
+
+    assert cursors and all(cursor.closed for cursor in cursors)
+    assert report.inserted == 1
+    assert report.errors[0]["line"] == 3
+    assert db.query(Users).filter(Users.username == "fresh").first() is not None
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+
+from ToDoApp.coalesce import SingleFlight, with_session
+
+
+def slow_query(calls, result="rows"):
+    calls.append(threading.get_ident())
+    time.sleep(0.05)
+    return result
+
+
+def test_concurrent_identical_reads_share_one_query():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        results = await asyncio.gather(*(flight.do(("todos", 1, ()), slow_query, calls) for _ in range(20)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == ["rows"] * 20
+    assert flight.stats()["coalesced"] == 19
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_and_invalidated_scopes_run_separately():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        first = asyncio.ensure_future(flight.do(("todos", 1, ()), slow_query, calls))
+        other_user = asyncio.ensure_future(flight.do(("todos", 2, ()), slow_query, calls))
+        await asyncio.sleep(0.01)
+        flight.invalidate(1)
+        after_write = asyncio.ensure_future(flight.do(("todos", 1, ()), slow_query, calls))
+        await asyncio.gather(first, other_user, after_write)
+        return calls
+
+    assert len(asyncio.run(scenario())) == 3
+
+
+def test_errors_reach_every_waiter():
+    def failing_query():
+        time.sleep(0.05)
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do(("admin_todo", "admin", ()), failing_query) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_disabled_runs_every_call():
+    async def scenario():
+        flight = SingleFlight(enabled=False)
+        calls = []
+        await asyncio.gather(*(flight.do(("todos", 1, ()), slow_query, calls) for _ in range(3)))
+        return calls
+
+    assert len(asyncio.run(scenario())) == 3
+
+
+def test_shared_call_owns_its_session():
+    class FakeSession:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    opened = []
+
+    def session_factory():
+        opened.append(FakeSession())
+        return opened[-1]
+
+    def query(db, calls):
+        assert not db.closed
+        return slow_query(calls)
+
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+        waiters = [asyncio.ensure_future(flight.do(("todos", 1, ()), with_session(session_factory, query), calls))
+                   for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # The first caller going away leaves the query and its session alone.
+        waiters[0].cancel()
+        return await asyncio.gather(*waiters[1:])
+
+    assert asyncio.run(scenario()) == ["rows", "rows"]
+    assert len(opened) == 1 and opened[0].closed
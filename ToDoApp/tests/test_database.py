@@ -0,0 +1,113 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from ToDoApp import database
+from ToDoApp.database import LAST_WRITE_COOKIE, Base, SessionRouter
+from ToDoApp.main import app
+from ToDoApp.models import Todos
+from ToDoApp.routers import auth, todos
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=primary)
+    Base.metadata.create_all(bind=replica)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def test_reads_use_replica_and_writes_use_primary(engines):
+    primary, replica = engines
+    router = SessionRouter(primary, [replica])
+
+    assert router.session(read_only=True, user_id=1).get_bind() is replica
+    assert router.session(user_id=1).get_bind() is primary
+
+
+def test_read_your_writes_stickiness(engines, monkeypatch):
+    primary, replica = engines
+    router = SessionRouter(primary, [replica], sticky_seconds=5)
+    clock = [100.0]
+    monkeypatch.setattr("ToDoApp.database.time.monotonic", lambda: clock[0])
+
+    router.record_write(1)
+    assert router.session(read_only=True, user_id=1).get_bind() is primary
+    assert router.session(read_only=True, user_id=2).get_bind() is replica
+
+    clock[0] += 5
+    assert router.session(read_only=True, user_id=1).get_bind() is replica
+
+
+def test_expired_writes_are_pruned_once_per_window(engines, monkeypatch):
+    primary, replica = engines
+    router = SessionRouter(primary, [replica], sticky_seconds=5)
+    clock = [100.0]
+    monkeypatch.setattr("ToDoApp.database.time.monotonic", lambda: clock[0])
+
+    router.record_write(1)
+    clock[0] += 4
+    router.record_write(2)
+    assert set(router._last_write) == {1, 2}
+
+    clock[0] += 2
+    router.record_write(3)
+    assert set(router._last_write) == {2, 3}
+
+
+def test_without_replicas_reads_use_primary(engines):
+    primary, _ = engines
+    router = SessionRouter(primary)
+
+    router.record_write(1)
+    assert router.session(read_only=True, user_id=2).get_bind() is primary
+
+
+def test_todo_routes_are_routed(engines, monkeypatch):
+    primary, replica = engines
+    router = SessionRouter(primary, [replica])
+    monkeypatch.setattr(auth, "session_router", router)
+    monkeypatch.setattr(todos, "session_router", router)
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        auth.get_current_user: lambda: {"id": 1, "username": "testuser", "role": "user"},
+        todos.get_db: lambda: router.primary(),
+    }
+    client = TestClient(app)
+    try:
+        # The replica has not caught up with anything yet.
+        response = client.post("/todos/", json={"title": "Fresh", "description": "Only on primary", "priority": 1})
+        assert response.status_code == 201
+        assert len(client.get("/todos/").json()) == 1
+
+        assert response.headers["X-Last-Write-At"]
+        assert client.cookies.get(LAST_WRITE_COOKIE) == response.headers["X-Last-Write-At"]
+
+        # Another worker has no record of the write, but the cookie carries it.
+        router._last_write.clear()
+        assert len(client.get("/todos/").json()) == 1
+
+        client.cookies.clear()
+        assert client.get("/todos/").json() == {"message": "No todos found."}
+        assert len(client.get("/todos/", headers={"X-Last-Write-At": response.headers["X-Last-Write-At"]}).json()) == 1
+
+        # Write times in the future (or not numbers at all) are ignored.
+        for forged in ("9999999999", "inf", "nan"):
+            assert client.get("/todos/", headers={"X-Last-Write-At": forged}).json() == {"message": "No todos found."}
+
+        with router.replicas[0]() as db:
+            db.add(Todos(title="Fresh", description="Replicated", priority=1, owner_id=1))
+            db.commit()
+        assert client.get("/todos/").json()[0]["description"] == "Replicated"
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def test_prepare_threshold_only_applies_to_psycopg3(monkeypatch):
+    assert database.engine_options("postgresql://u@localhost/db") == {}
+    assert database.engine_options("postgresql+psycopg://u@localhost/db") == {"connect_args": {"prepare_threshold": 5}}
+    monkeypatch.setattr(database, "PREPARE_THRESHOLD", "none")
+    assert database.engine_options("postgresql+psycopg://u@localhost/db") == {"connect_args": {"prepare_threshold": None}}
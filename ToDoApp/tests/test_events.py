@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from ToDoApp.events import EventHub, format_sse
+from ToDoApp.main import app
+from ToDoApp.models import Users
+from ToDoApp.routers import admin, todos
+from ToDoApp.routers.auth import get_current_user
+
+
+def test_publish_fans_out_per_user():
+    async def scenario():
+        hub = EventHub()
+        first = hub.subscribe(1)
+        second = hub.subscribe(1)
+        other = hub.subscribe(2)
+
+        hub.publish(1, "created", {"id": 7})
+
+        assert (await first.get(0.1))["data"] == {"id": 7}
+        assert (await second.get(0.1))["type"] == "created"
+        assert await other.get(0.01) is None
+        assert hub.stats() == {"users": 2, "subscribers": 3, "published": 1, "delivered": 2}
+
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        hub.publish(1, "deleted", {"id": 7})
+        assert hub.stats()["users"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_is_told_to_resync():
+    async def scenario():
+        hub = EventHub(queue_size=2)
+        slow = hub.subscribe(1)
+        for todo_id in range(3):
+            hub.publish(1, "updated", {"id": todo_id})
+
+        event = await slow.get(0.1)
+        assert event["type"] == "resync"
+        assert slow.resyncs == 1
+        assert await slow.get(0.01) is None
+
+        hub.publish(1, "updated", {"id": 9})
+        assert (await slow.get(0.1))["data"] == {"id": 9}
+
+    asyncio.run(scenario())
+
+
+def test_format_sse():
+    event = {"id": 3, "type": "deleted", "data": {"id": 5}}
+    assert format_sse(event) == 'id: 3\nevent: deleted\ndata: {"id": 5}\n\n'
+
+
+@pytest.fixture
+def session_factory(session_factory):
+    with session_factory() as db:
+        db.add(Users(id=1, username="owner", email="owner@example.com", hashed_password="x", role="user"))
+        db.commit()
+    return session_factory
+
+
+@pytest.fixture
+def published(session_factory, monkeypatch):
+    events = []
+
+    class RecordingHub:
+        def publish(self, user_id, event_type, data):
+            events.append((user_id, event_type, jsonable_encoder(data)))
+
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    monkeypatch.setattr(todos, "hub", RecordingHub())
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        todos.get_db: override_get_db,
+        admin.get_db: override_get_db,
+        get_current_user: lambda: {"username": "owner", "id": 1, "role": "user"},
+    }
+    try:
+        yield events
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def test_todo_writes_publish_events(published):
+    client = TestClient(app)
+    todo = {"title": "Stream me", "description": "Published", "priority": 2}
+
+    todo_id = client.post("/todos/", json=todo).json()["id"]
+    client.put(f"/todos/{todo_id}", json={**todo, "complete": True})
+    client.patch(f"/todos/{todo_id}", json={"priority": 3})
+    client.delete(f"/todos/{todo_id}")
+
+    assert [(user_id, event_type) for user_id, event_type, _ in published] == [
+        (1, "created"), (1, "updated"), (1, "updated"), (1, "deleted"),
+    ]
+    assert published[0][2]["title"] == "Stream me"
+    assert published[1][2]["complete"] is True
+    assert published[2][2]["priority"] == 3
+    assert published[3][2] == {"id": todo_id}
+
+
+def test_admin_delete_publishes_to_the_owner(published):
+    client = TestClient(app)
+    todo_id = client.post("/todos/", json={"title": "Moderated", "description": "By an admin", "priority": 1}).json()["id"]
+
+    app.dependency_overrides[get_current_user] = lambda: {"username": "admin", "id": 99, "role": "admin"}
+    assert client.delete(f"/admin/todo/{todo_id}").status_code == 204
+    assert published[-1] == (1, "deleted", {"id": todo_id})
+
+
+def test_stream_requires_authentication():
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {}
+    try:
+        assert TestClient(app).get("/todos/stream").status_code == 401
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def test_stream_sends_events_and_unsubscribes_on_disconnect(monkeypatch):
+    hub = EventHub()
+    monkeypatch.setattr(todos, "hub", hub)
+    monkeypatch.setattr(todos, "HEARTBEAT_SECONDS", 0.05)
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {get_current_user: lambda: {"username": "owner", "id": 1, "role": "user"}}
+
+    async def scenario():
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/todos/stream", "raw_path": b"/todos/stream", "root_path": "",
+            "query_string": b"", "headers": [(b"host", b"testserver")], "client": ("test", 1),
+            "server": ("testserver", 80),
+        }
+        disconnected = asyncio.Event()
+        sent = []
+        body = asyncio.Queue()
+
+        async def receive():
+            if not sent:
+                sent.append("request")
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                sent.append(message)
+            elif message.get("body"):
+                await body.put(message["body"].decode())
+
+        connection = asyncio.create_task(app(scope, receive, send))
+        while not hub.stats()["subscribers"]:
+            await asyncio.sleep(0.01)
+
+        assert await asyncio.wait_for(body.get(), 1) == ": keep-alive\n\n"
+        hub.publish(1, "created", {"id": 7})
+        hub.publish(2, "created", {"id": 8})
+        chunk = await asyncio.wait_for(body.get(), 1)
+        while chunk.startswith(":"):
+            chunk = await asyncio.wait_for(body.get(), 1)
+        assert chunk == 'id: 1\nevent: created\ndata: {"id": 7}\n\n'
+
+        disconnected.set()
+        await asyncio.wait_for(connection, 1)
+        start = sent[1]
+        assert start["status"] == 200
+        assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+        assert hub.stats()["subscribers"] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.dependency_overrides = original_overrides
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ToDoApp import idempotency
+from ToDoApp.main import app
+from ToDoApp.models import IdempotencyKeys, Todos, Users
+from ToDoApp.routers import auth, todos
+
+client = TestClient(app)
+
+USER_DATA = {
+    "username": "retryuser",
+    "password": "password123",
+    "email": "retry@example.com",
+    "first_name": "Retry",
+    "last_name": "User",
+    "role": "user",
+    "phone_number": "1234567890"
+}
+
+
+@pytest.fixture
+def session_factory(session_factory, monkeypatch):
+    factory = session_factory
+    monkeypatch.setattr(idempotency, "store", idempotency.IdempotencyStore())
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        auth.get_db: lambda: factory(),
+        todos.get_db: lambda: factory(),
+        auth.get_current_user: lambda: {"id": 1, "username": "testuser", "role": "user"},
+    }
+    yield factory
+    app.dependency_overrides = original_overrides
+
+
+def test_retried_todo_creation_returns_stored_response(session_factory):
+    payload = {"title": "Buy milk", "description": "Two litres", "priority": 1}
+    headers = {"Idempotency-Key": "create-1"}
+
+    first = client.post("/todos/", json=payload, headers=headers)
+    idempotency.store._cache.clear()  # force the retry through the table
+    retry = client.post("/todos/", json=payload, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    with session_factory() as db:
+        assert db.query(Todos).count() == 1
+
+
+def test_reused_key_with_different_payload_is_rejected(session_factory):
+    headers = {"Idempotency-Key": "create-2"}
+    client.post("/todos/", json={"title": "Buy milk", "description": "Two litres", "priority": 1}, headers=headers)
+
+    response = client.post("/todos/", json={"title": "Buy eggs", "description": "A dozen", "priority": 1}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_retried_user_creation_skips_hashing(session_factory, monkeypatch):
+    hashes = []
+    original_hash = auth.bcrypt_context.hash
+    monkeypatch.setattr(auth.bcrypt_context, "hash", lambda secret: hashes.append(secret) or original_hash(secret))
+    headers = {"Idempotency-Key": "signup-1"}
+
+    first = client.post("/auth/", json=USER_DATA, headers=headers)
+    retry = client.post("/auth/", json=USER_DATA, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert len(hashes) == 1
+    with session_factory() as db:
+        assert db.query(Users).count() == 1
+
+
+def test_reused_signup_key_with_different_password_is_rejected(session_factory):
+    headers = {"Idempotency-Key": "signup-2"}
+    assert client.post("/auth/", json=USER_DATA, headers=headers).status_code == 201
+
+    response = client.post("/auth/", json={**USER_DATA, "password": "another-password"}, headers=headers)
+    assert response.status_code == 422
+    with session_factory() as db:
+        row = db.query(IdempotencyKeys).one()
+        assert USER_DATA["password"] not in row.request_hash + row.response_body
+
+
+def test_sweep_expired_removes_only_expired_keys(session_factory):
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        for i in range(5):
+            db.add(IdempotencyKeys(key=f"old-{i}", request_hash="h", status_code=201, response_body="{}",
+                                   expires_at=now - timedelta(minutes=1)))
+        db.add(IdempotencyKeys(key="fresh", request_hash="h", status_code=201, response_body="{}",
+                               expires_at=now + timedelta(hours=1)))
+        db.commit()
+
+    assert idempotency.sweep_expired(session_factory, batch_size=2, pause=0) == 5
+    with session_factory() as db:
+        assert [row.key for row in db.query(IdempotencyKeys).all()] == ["fresh"]
@@ -0,0 +1,142 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from ToDoApp import ordering
+from ToDoApp.main import app
+from ToDoApp.models import Todos
+from ToDoApp.routers.auth import get_current_user, get_read_db, get_read_session_factory
+from ToDoApp.routers.todos import get_db
+
+
+@pytest.mark.parametrize("a, b, expected", [
+    (None, None, "a0"),
+    (None, "a0", "Zz"),
+    ("a0", None, "a1"),
+    ("a0", "a1", "a0V"),
+    ("a0V", "a1", "a0l"),
+    ("Zz", "a0", "ZzV"),
+    ("Zz", "a1", "a0"),
+    (None, "Y00", "Xzzz"),
+    ("bzz", None, "c000"),
+    ("a0", "a0V", "a0G"),
+    ("b125", "b129", "b127"),
+    ("a0", "a1V", "a1"),
+])
+def test_generate_key_between(a, b, expected):
+    assert ordering.generate_key_between(a, b) == expected
+
+
+def test_generate_key_between_rejects_bad_input():
+    with pytest.raises(ValueError):
+        ordering.generate_key_between("a1", "a0")
+    with pytest.raises(ValueError):
+        ordering.generate_key_between("a00", None)
+
+
+def test_random_inserts_stay_sorted():
+    rng = random.Random(42)
+    keys = [ordering.generate_key_between(None, None)]
+    for _ in range(2000):
+        i = rng.randint(0, len(keys))
+        keys.insert(i, ordering.generate_key_between(keys[i - 1] if i else None, keys[i] if i < len(keys) else None))
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+    assert ordering.generate_n_keys_between(None, None, 63)[-2:] == ["az", "b00"]
+
+
+@pytest.fixture
+def client(session_factory):
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {
+        get_db: override_get_db,
+        get_read_db: override_get_db,
+        get_read_session_factory: lambda: session_factory,
+        get_current_user: lambda: {"username": "testuser", "id": 1, "role": "user"},
+    }
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def titles(client):
+    return [todo["title"] for todo in client.get("/todos/").json()]
+
+
+def test_move_writes_one_row(client, session_factory):
+    ids = {
+        title: client.post("/todos/", json={"title": title, "description": "Desc", "priority": 1}).json()["id"]
+        for title in ("one", "two", "three", "four")
+    }
+    assert titles(client) == ["one", "two", "three", "four"]
+
+    updates = []
+    event.listen(session_factory.kw["bind"], "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: updates.append(statement) if statement.startswith("UPDATE") else None)
+    assert client.post(f"/todos/{ids['four']}/move", json={"after_id": ids["one"]}).status_code == 200
+    assert len(updates) == 1
+    assert titles(client) == ["one", "four", "two", "three"]
+
+    client.post(f"/todos/{ids['three']}/move", json={})
+    assert titles(client) == ["three", "one", "four", "two"]
+    client.post(f"/todos/{ids['three']}/move", json={"after_id": ids["two"]})
+    assert titles(client) == ["one", "four", "two", "three"]
+
+    assert client.post(f"/todos/{ids['one']}/move", json={"after_id": ids["one"]}).status_code == 400
+    assert client.post(f"/todos/{ids['one']}/move", json={"after_id": 999}).status_code == 404
+    assert client.post("/todos/999/move", json={}).status_code == 404
+
+
+def test_rebalance_compacts_long_keys(client, session_factory, monkeypatch):
+    first = client.post("/todos/", json={"title": "first", "description": "Desc", "priority": 1}).json()["id"]
+    client.post("/todos/", json={"title": "last", "description": "Desc", "priority": 1}).json()["id"]
+    # Dragging todos into the same gap again and again lengthens the keys.
+    moved = []
+    for i in range(40):
+        todo_id = client.post("/todos/", json={"title": f"moved {i}", "description": "Desc", "priority": 1}).json()["id"]
+        client.post(f"/todos/{todo_id}/move", json={"after_id": first})
+        moved.insert(0, f"moved {i}")
+    expected = ["first", *moved, "last"]
+    assert titles(client) == expected
+
+    monkeypatch.setattr(ordering, "REBALANCE_KEY_LENGTH", 5)
+    with session_factory() as db:
+        assert ordering.owners_to_rebalance(db) == [1]
+    assert ordering.run_rebalance(session_factory) > 0
+    assert titles(client) == expected
+    with session_factory() as db:
+        positions = [todo.position for todo in db.query(Todos).order_by(Todos.position)]
+        assert positions == ordering.generate_n_keys_between(None, None, 42)
+        assert ordering.owners_to_rebalance(db) == []
+
+
+def test_rebalance_repairs_missing_and_duplicate_keys(client, session_factory):
+    for title in ("one", "two"):
+        client.post("/todos/", json={"title": title, "description": "Desc", "priority": 1})
+    with session_factory() as db:
+        assert ordering.owners_to_rebalance(db) == []
+        db.add(Todos(title="unpositioned", description="Desc", priority=1, owner_id=1))
+        db.commit()
+        assert ordering.owners_to_rebalance(db) == [1]
+    ordering.run_rebalance(session_factory)
+    assert titles(client) == ["one", "two", "unpositioned"]
+
+    # Two appends that raced each other got the same key.
+    with session_factory() as db:
+        last = db.query(Todos).filter(Todos.title == "unpositioned").one().position
+        db.add(Todos(title="raced", description="Desc", priority=1, owner_id=1, position=last))
+        db.commit()
+        assert ordering.owners_to_rebalance(db) == [1]
+    ordering.run_rebalance(session_factory)
+    assert titles(client) == ["one", "two", "unpositioned", "raced"]
+    with session_factory() as db:
+        positions = [todo.position for todo in db.query(Todos).order_by(Todos.position)]
+        assert positions == ordering.generate_n_keys_between(None, None, 4)
+        assert ordering.owners_to_rebalance(db) == []
@@ -0,0 +1,104 @@
+import sys
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from ToDoApp import profiling
+from ToDoApp.main import app
+from ToDoApp.models import Todos
+from ToDoApp.routers.auth import create_access_token, get_current_user, get_read_db, get_read_session_factory
+
+
+def token(role):
+    return create_access_token("alice", 1, role, timedelta(minutes=5))
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    with session_factory() as db:
+        db.add(Todos(title="Profiled", description="Desc", priority=1, owner_id=1))
+        db.commit()
+
+    def override_get_read_db():
+        with session_factory() as db:
+            yield db
+
+    # The middleware holds on to the module's profiler; reset it in place.
+    monkeypatch.setattr(profiling.profiler, "profiles", profiling.deque(maxlen=2))
+    monkeypatch.setattr(profiling.profiler, "sample_rate", 0.0)
+    original_overrides = app.dependency_overrides
+    app.dependency_overrides = {get_read_db: override_get_read_db, get_read_session_factory: lambda: session_factory}
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides = original_overrides
+
+
+def test_collapse_stack_is_root_first():
+    def leaf():
+        return collapse()
+
+    def collapse():
+        return profiling.collapse_stack(sys._current_frames()[threading.get_ident()])
+
+    frames = leaf().split(";")
+    assert frames[-1].startswith("collapse (test_profiling.py:")
+    assert frames[-2].startswith("leaf (test_profiling.py:")
+
+
+def test_concurrent_profiles_share_one_sampler_thread():
+    profiler = profiling.Profiler(sample_rate=0.0, interval=0.001)
+    scope = {"method": "GET", "path": "/todos/"}
+    before = set(threading.enumerate())
+    profiles = [profiler.begin(scope, "header") for _ in range(3)]
+    time.sleep(0.05)
+    started = [thread for thread in set(threading.enumerate()) - before if thread.name.startswith("profiler")]
+    for profile in profiles:
+        profiler.finish(profile, 200)
+    assert len(started) == 1
+    assert all(profile.summary()["samples"] > 0 for profile in profiles)
+    # Finished profiles are left alone.
+    samples = [profile.summary()["samples"] for profile in profiles]
+    time.sleep(0.01)
+    assert [profile.summary()["samples"] for profile in profiles] == samples
+
+
+def test_profile_header_is_honoured_for_admins_only(client):
+    headers = {"X-Profile": "1", "Authorization": f"Bearer {token('user')}"}
+    assert client.get("/todos/", headers=headers).status_code == 200
+    assert len(profiling.profiler.profiles) == 0
+
+    headers["Authorization"] = f"Bearer {token('admin')}"
+    assert client.get("/todos/", headers=headers).status_code == 200
+    [profile] = profiling.profiler.profiles
+    assert (profile.path, profile.trigger, profile.status_code) == ("/todos/", "header", 200)
+    assert any("todos" in statement["statement"] for statement in profile.statements)
+
+
+def test_streams_are_never_profiled(monkeypatch):
+    monkeypatch.setattr(profiling.profiler, "sample_rate", 1.0)
+    admin = [(b"authorization", f"Bearer {token('admin')}".encode()), (profiling.PROFILE_HEADER, b"1")]
+    assert profiling.profiler.trigger({"path": "/todos/stream", "headers": admin}) is None
+    assert profiling.profiler.trigger({"path": "/todos/", "headers": admin}) == "header"
+
+
+def test_profiles_are_sampled_and_kept_in_a_ring_buffer(client):
+    app.dependency_overrides[get_current_user] = lambda: {"username": "alice", "id": 1, "role": "admin"}
+    settings = client.put("/admin/profiles/settings", json={"sample_rate": 1.0}).json()
+    assert settings["sample_rate"] == 1.0
+
+    for _ in range(3):
+        client.get("/todos/")
+    profiles = client.get("/admin/profiles").json()["items"]
+    assert len(profiles) == 2
+    assert profiles[0]["id"] > profiles[1]["id"]
+
+    detail = client.get(f"/admin/profiles/{profiles[1]['id']}").json()
+    assert detail["trigger"] == "sample" and detail["sql"]
+    collapsed = client.get(f"/admin/profiles/{profiles[1]['id']}?format=collapsed")
+    assert collapsed.headers["content-type"].startswith("text/plain")
+    assert collapsed.text == detail["stacks"]
+    assert client.get("/admin/profiles/999999").status_code == 404
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from ToDoApp import background, purge
+from ToDoApp.models import Todos
+
+NOW = datetime(2026, 1, 1, 2, 0, tzinfo=timezone.utc)
+
+
+def add_todos(session_factory, count, deleted_at=None):
+    with session_factory() as db:
+        db.add_all(
+            Todos(title=f"Todo {i}", description="Desc", priority=1, owner_id=1, deleted_at=deleted_at)
+            for i in range(count)
+        )
+        db.commit()
+
+
+def test_run_purge_deletes_old_tombstones_in_batches(session_factory, monkeypatch):
+    monkeypatch.setattr(purge, "PURGE_BATCH_SIZE", 2)
+    add_todos(session_factory, 5, deleted_at=NOW - timedelta(days=1))
+    add_todos(session_factory, 1, deleted_at=NOW)
+    add_todos(session_factory, 3)
+
+    batches_before = purge.stats.batches_total
+    assert purge.run_purge(session_factory, now=NOW, pause=0) == 5
+    assert purge.stats.batches_total - batches_before == 3
+
+    with session_factory() as db:
+        assert purge.backlog(db) == 1
+        assert db.query(Todos).count() == 4
+    assert purge.stats.last_run_rows == 5
+
+
+def test_run_purge_waits_for_off_peak_window(session_factory):
+    add_todos(session_factory, 1, deleted_at=NOW - timedelta(days=1))
+
+    assert purge.run_purge(session_factory, now=NOW.replace(hour=12), pause=0) == 0
+    assert purge.run_purge(session_factory, now=NOW.replace(hour=12), force=True, pause=0) == 1
+
+
+def test_in_window_wraps_midnight():
+    assert purge.in_window(NOW.replace(hour=23), (22, 4))
+    assert purge.in_window(NOW.replace(hour=3), (22, 4))
+    assert not purge.in_window(NOW.replace(hour=4), (22, 4))
+
+
+def test_purge_batch_skips_rows_locked_by_another_purger(session_factory):
+    captured = []
+
+    class Recorder:
+        def execute(self, statement, **kwargs):
+            captured.append(statement)
+            return type("Result", (), {"rowcount": 0})()
+
+        def commit(self):
+            pass
+
+    purge.purge_batch(Recorder(), NOW, 10)
+    sql = str(captured[0].compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_exclusive_jobs_run_only_in_the_elected_process(session_factory, monkeypatch):
+    runs = []
+    task = background.PeriodicTask("test-job", 60, lambda: runs.append("exclusive"), exclusive=True)
+    shared = background.PeriodicTask("test-shared", 60, lambda: runs.append("shared"))
+
+    monkeypatch.setattr(background.runner, "enabled", False)
+    task._run_job()
+    shared._run_job()
+    assert runs == ["shared"] and not background.runner.elected
+
+    # Without PostgreSQL there is nothing to elect: this process is the runner.
+    monkeypatch.setattr(background.runner, "enabled", True)
+    monkeypatch.setattr(background.runner, "bind", session_factory.kw["bind"])
+    task._run_job()
+    assert runs == ["shared", "exclusive"] and background.runner.elected
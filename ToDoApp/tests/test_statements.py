@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import event
+
+from ToDoApp import statements
+from ToDoApp.models import Todos, Users
+
+
+@pytest.fixture
+def db(db):
+    db.add_all([
+        Users(id=1, username="alice", email="a@example.com", hashed_password="x", role="user"),
+        Users(id=2, username="bob", email="b@example.com", hashed_password="x", role="user"),
+        Todos(id=1, title="Mine", description="Desc", priority=1, owner_id=1, position="a1"),
+        Todos(id=2, title="First", description="Desc", priority=1, owner_id=1, position="a0"),
+        Todos(id=3, title="Deleted", description="Desc", priority=1, owner_id=1,
+              deleted_at=datetime.now(timezone.utc)),
+        Todos(id=4, title="Bob's", description="Desc", priority=1, owner_id=2),
+    ])
+    db.commit()
+    return db
+
+
+def test_user_lookups(db):
+    assert db.scalars(statements.user_by_username, {"username": "bob"}).first().id == 2
+    assert db.scalars(statements.user_by_username, {"username": "carol"}).first() is None
+    assert db.scalars(statements.user_by_id, {"id": 1}).first().username == "alice"
+
+
+def test_todo_lookups_respect_owner_and_soft_delete(db):
+    assert db.scalars(statements.owned_live_todo, {"id": 1, "owner_id": 1}).first().title == "Mine"
+    assert db.scalars(statements.owned_live_todo, {"id": 4, "owner_id": 1}).first() is None
+    assert db.scalars(statements.owned_live_todo, {"id": 3, "owner_id": 1}).first() is None
+    assert db.scalars(statements.live_todo_by_id, {"id": 4}).first().owner_id == 2
+    assert [todo.id for todo in db.scalars(statements.owner_live_todos, {"owner_id": 1})] == [2, 1]
+
+
+def test_repeated_lookups_hit_the_compiled_cache(db):
+    cached = []
+    event.listen(db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, params, context, executemany:
+                 cached.append(context.cache_hit.name == "CACHE_HIT"))
+    for username in ("alice", "bob", "alice"):
+        db.scalars(statements.user_by_username, {"username": username}).first()
+    assert cached[1:] == [True, True]
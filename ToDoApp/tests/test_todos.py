@@ -4,7 +4,8 @@ from sqlalchemy.orm import Session
 
 from ToDoApp.main import app
 from ToDoApp.routers.todos import get_db # Corrected import for get_db
-from ToDoApp.routers.auth import get_current_user
+from ToDoApp.routers.auth import get_current_user, get_read_db, get_read_session_factory
+from ToDoApp.events import hub
 from ToDoApp.models import Todos, Users
 
 # Mock database session
@@ -36,7 +37,7 @@ class MockSession:
 
                 for condition in conditions:
                     attr_name = condition.left.name
-                    value = condition.right.value
+                    value = getattr(condition.right, "value", None)  # IS NULL has no bound value
 
                     # Apply this condition to the current_items
                     if self._model_cls == Todos and attr_name == "owner_id":
@@ -71,9 +72,20 @@ class MockSession:
                 self.all_called = True
                 return self._data.get(self._model_cls, [])
 
+            def order_by(self, *columns):
+                return self
+
 
         return Query(self.data, model)
 
+    def scalars(self, statement, params=None):
+        # Pre-built statements: match the bound parameters by column name.
+        model = statement.column_descriptions[0]["entity"]
+        query = self.query(model).filter(model.deleted_at.is_(None))
+        for name, value in (params or {}).items():
+            query = query.filter(getattr(model, name) == value)
+        return query
+
     def add(self, instance):
         self.add_count += 1
         model_type = type(instance)
@@ -87,6 +99,11 @@ class MockSession:
 
         self.data[model_type].append(instance)
 
+    def scalar(self, statement):
+        # Only used for the owner's last position when creating a todo.
+        positions = [todo.position for todo in self.data.get(Todos, []) if todo.position]
+        return max(positions, default=None)
+
     def commit(self):
         self.commit_count += 1
 
@@ -126,6 +143,8 @@ def override_get_current_user():
     return {"id": 1, "username": "testuser", "role": "user"}
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
+app.dependency_overrides[get_read_session_factory] = lambda: MockSession
 app.dependency_overrides[get_current_user] = override_get_current_user
 
 client = TestClient(app)
@@ -135,6 +154,8 @@ client = TestClient(app)
 def test_create_todo(mock_db_session: MockSession, test_user: Users):
     # Override get_db for this specific test
     app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
 
@@ -156,6 +177,8 @@ def test_create_todo(mock_db_session: MockSession, test_user: Users):
 
 def test_read_all_todos(mock_db_session: MockSession, test_user: Users):
     app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     # Add some todos to the mock database
@@ -175,6 +198,8 @@ def test_read_all_todos(mock_db_session: MockSession, test_user: Users):
 
 def test_read_todo_by_id_success(mock_db_session: MockSession, test_user: Users):
     app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     todo = Todos(id=1, title="Specific Todo", description="Desc", priority=1, complete=False, owner_id=test_user.id)
@@ -190,6 +215,8 @@ def test_read_todo_by_id_success(mock_db_session: MockSession, test_user: Users)
 
 def test_read_todo_by_id_not_found(mock_db_session: MockSession, test_user: Users):
     app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     response = client.get("/todos/999")  # Non-existent ID
@@ -197,13 +224,16 @@ def test_read_todo_by_id_not_found(mock_db_session: MockSession, test_user: User
     assert response.json() == {"detail": "Todo not found"}
 
 
-def test_update_todo_success(mock_db_session: MockSession, test_user: Users):
-    app.dependency_overrides[get_db] = lambda: mock_db_session
+def test_update_todo_success(db: Session, test_user: Users):
+    # UPDATE ... RETURNING needs a real database.
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: db
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     todo = Todos(id=1, title="Old Title", description="Old Desc", priority=1, complete=False, owner_id=test_user.id)
-    mock_db_session.add(todo)
-    mock_db_session.commit()
+    db.add(todo)
+    db.commit()
 
     updated_data = {"title": "New Title", "description": "New Desc", "priority": 2, "complete": True}
     response = client.put(f"/todos/{todo.id}", json=updated_data)
@@ -213,15 +243,22 @@ def test_update_todo_success(mock_db_session: MockSession, test_user: Users):
     assert data["title"] == "New Title"
     assert data["priority"] == 2
     assert data["complete"] is True
+    assert response.headers["etag"] == '"2"'
 
-    # Verify update in mock_db
-    updated_todo_in_db = mock_db_session.query(Todos).filter(Todos.id == todo.id).first()
+    # Verify update in the database
+    updated_todo_in_db = db.query(Todos).filter(Todos.id == 1).first()
     assert updated_todo_in_db is not None
     assert updated_todo_in_db.title == "New Title"
 
+    # Each unconditional update gets its own version.
+    response = client.put("/todos/1", json={**updated_data, "title": "Newer Title"})
+    assert response.headers["etag"] == '"3"'
 
-def test_update_todo_not_found(mock_db_session: MockSession, test_user: Users):
-    app.dependency_overrides[get_db] = lambda: mock_db_session
+
+def test_update_todo_not_found(db: Session, test_user: Users):
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: db
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     updated_data = {"title": "New Title", "description": "New Desc", "priority": 2, "complete": True}
@@ -233,6 +270,8 @@ def test_update_todo_not_found(mock_db_session: MockSession, test_user: Users):
 
 def test_delete_todo_success(mock_db_session: MockSession, test_user: Users):
     app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     todo = Todos(id=1, title="To Be Deleted", description="Desc", priority=1, complete=False, owner_id=test_user.id)
@@ -242,19 +281,151 @@ def test_delete_todo_success(mock_db_session: MockSession, test_user: Users):
     response = client.delete(f"/todos/{todo.id}")
     assert response.status_code == 204
 
-    # Verify deletion in mock_db
-    deleted_todo_in_db = mock_db_session.query(Todos).filter(Todos.id == todo.id).first()
+    # Verify the todo is soft-deleted in mock_db and hidden from reads
+    assert todo.deleted_at is not None
+    deleted_todo_in_db = mock_db_session.query(Todos).filter(Todos.id == todo.id, Todos.deleted_at.is_(None)).first()
     assert deleted_todo_in_db is None
+    assert client.get(f"/todos/{todo.id}").status_code == 404
 
 
 def test_delete_todo_not_found(mock_db_session: MockSession, test_user: Users):
     app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
     app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
 
     response = client.delete("/todos/999")  # Non-existent ID
     assert response.status_code == 404
     assert response.json() == {"detail": "Todo not found"}
 
+def test_read_all_todos_sparse_fields(mock_db_session: MockSession, test_user: Users):
+    app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
+    app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
+
+    mock_db_session.add(Todos(title="Todo 1", description="Desc 1", priority=1, complete=False, owner_id=test_user.id))
+
+    response = client.get("/todos/?fields=id,title,complete")
+    assert response.status_code == 200
+    assert response.json() == [{"id": 1, "title": "Todo 1", "complete": False}]
+
+
+def test_read_all_todos_unknown_field(mock_db_session: MockSession, test_user: Users):
+    app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
+    app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
+
+    response = client.get("/todos/?fields=title,hashed_password")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown fields: hashed_password"}
+
+
+def test_read_all_todos_compressed(mock_db_session: MockSession, test_user: Users):
+    app.dependency_overrides[get_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_db] = lambda: mock_db_session
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: mock_db_session
+    app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
+
+    for i in range(50):
+        mock_db_session.add(Todos(title=f"Todo {i}", description="Desc " * 10, priority=1, complete=False, owner_id=test_user.id))
+
+    response = client.get("/todos/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 50
+
+    response = client.get("/todos/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_update_todo_if_match(db: Session, test_user: Users):
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: db
+    app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
+
+    created = client.post("/todos/", json={"title": "Shared", "description": "Desc", "priority": 1})
+    todo_id = created.json()["id"]
+    assert client.get(f"/todos/{todo_id}").headers["etag"] == '"1"'
+
+    updated_data = {"title": "From phone", "description": "Desc", "priority": 2, "complete": False}
+    response = client.put(f"/todos/{todo_id}", json=updated_data, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+    assert response.json()["version"] == 2
+
+    # A second device still holding version 1 must not clobber the change.
+    stale = {"title": "From laptop", "description": "Desc", "priority": 3, "complete": True}
+    response = client.put(f"/todos/{todo_id}", json=stale, headers={"If-Match": '"1"'})
+    assert response.status_code == 412
+    assert response.headers["etag"] == '"2"'
+    response = client.put(f"/todos/{todo_id}", json={**stale, "version": 1})
+    assert response.status_code == 412
+    assert client.get(f"/todos/{todo_id}").json()["title"] == "From phone"
+
+    assert client.put("/todos/999", json=stale, headers={"If-Match": '"1"'}).status_code == 404
+    assert client.put(f"/todos/{todo_id}", json=stale, headers={"If-Match": "abc"}).status_code == 400
+
+
+def test_patch_todo_updates_only_supplied_fields(db: Session, test_user: Users):
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: db
+    app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
+
+    todo_id = client.post("/todos/", json={"title": "Groceries", "description": "Milk", "priority": 2}).json()["id"]
+
+    response = client.patch(f"/todos/{todo_id}", json={"complete": True})
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"2"'
+    assert {key: response.json()[key] for key in ("title", "description", "priority", "complete")} == {
+        "title": "Groceries", "description": "Milk", "priority": 2, "complete": True,
+    }
+
+    assert client.patch(f"/todos/{todo_id}", json={"title": "Go"}).status_code == 422
+    assert client.patch(f"/todos/{todo_id}", json={"title": None}).status_code == 422
+    assert client.patch(f"/todos/{todo_id}", json={}).status_code == 400
+    assert client.patch(f"/todos/{todo_id}", json={"priority": 3}, headers={"If-Match": '"1"'}).status_code == 412
+    assert client.patch("/todos/999", json={"priority": 3}).status_code == 404
+
+
+def test_bulk_status_updates_matching_todos(db: Session, test_user: Users, monkeypatch):
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_read_db] = lambda: db
+    app.dependency_overrides[get_read_session_factory] = lambda: lambda: db
+    app.dependency_overrides[get_current_user] = lambda: {"id": test_user.id, "username": test_user.username, "role": test_user.role}
+
+    ids = [
+        client.post("/todos/", json={"title": f"Todo {i}", "description": "Desc", "priority": i % 2 + 1}).json()["id"]
+        for i in range(4)
+    ]
+    db.add(Todos(title="Other user", description="Desc", priority=1, complete=False, owner_id=2))
+    db.commit()
+    published = []
+    monkeypatch.setattr(hub, "publish", lambda *event: published.append(event))
+
+    response = client.post("/todos/bulk-status", json={"complete": True, "ids": [ids[0], ids[1], 999]})
+    assert response.json() == {"updated": [ids[0], ids[1]]}
+    assert published == [(test_user.id, "bulk_updated", {
+        "complete": True, "todos": [{"id": ids[0], "version": 2}, {"id": ids[1], "version": 2}],
+    })]
+    # Already complete: nothing is rewritten.
+    assert client.post("/todos/bulk-status", json={"complete": True, "ids": [ids[0]]}).json() == {"updated": []}
+    assert len(published) == 1
+
+    response = client.post("/todos/bulk-status", json={"complete": True, "priority": 1})
+    assert response.json() == {"updated": [ids[2]]}
+    response = client.post("/todos/bulk-status", json={"complete": True})
+    assert response.json() == {"updated": [ids[3]]}
+
+    todos = {todo["id"]: todo for todo in client.get("/todos/").json()}
+    assert all(todos[todo_id]["complete"] for todo_id in ids)
+    assert [todos[todo_id]["version"] for todo_id in ids] == [2, 2, 2, 2]
+    assert client.post("/todos/bulk-status", json={"complete": False, "ids": []}).status_code == 422
+
+
 # Reset dependency overrides after tests (optional, good practice)
 @pytest.fixture(autouse=True, scope="module")
 def reset_dependencies():